@@ -1,6 +1,12 @@
 # chat_with_PDF.py
+import json
 import os
 import re
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import accumulate
 from typing import Optional
 
 import numpy as np
@@ -18,6 +24,29 @@ try:
 except ImportError:
     OpenAI = None
 
+# --- Optional SIMD kernels for similarity search ---
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Preset chat prompts: radio label -> question sent to the model
+PRESET_QUESTIONS = {
+    "Give me a concise summary": "Summarize the PDF in 5–7 bullet points focusing on the main ideas.",
+    "List the key concepts": "List the key concepts and define each in one sentence.",
+    "Explain an important code example": (
+        "Pick one important code example from the text and explain how it works step by step."
+    ),
+    "What are the most common pitfalls?": (
+        "What common mistakes or pitfalls should a learner avoid, according to this PDF?"
+    ),
+}
+
+# Preset question embeddings, fetched alongside the first chunk batch of an index build
+_PRESET_EMBS: dict[str, np.ndarray] = {}
+
 
 def _need_openai_warning():
     st.warning(
@@ -26,20 +55,105 @@ def _need_openai_warning():
     )
 
 
-def _cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
-    denom = (np.linalg.norm(a) * np.linalg.norm(b))
-    if denom == 0:
-        return 0.0
-    return float(np.dot(a, b) / denom)
+@lru_cache(maxsize=1)
+def _client(api_key: str):
+    """One OpenAI client per key so its HTTP connection pool is reused across questions."""
+    return OpenAI(api_key=api_key)
+
+
+def _quantize_int8(vecs: np.ndarray) -> np.ndarray:
+    """Scale each row into [-127, 127] and round to int8 (cosine is scale-invariant)."""
+    scale = 127.0 / np.abs(vecs).max(axis=-1, keepdims=True).clip(min=1e-12)
+    return np.rint(vecs * scale).astype(np.int8)
 
 
 def _ensure_session_structs():
     if "pdf_chat_indexes" not in st.session_state:
-        st.session_state.pdf_chat_indexes = {}  # key: (filename, mtime) -> {"chunks": [...], "embs": np.array}
+        st.session_state.pdf_chat_indexes = {}  # key: (filename, mtime) -> {"buf": str, "offsets": np.array, "embs": np.array}
     if "pdf_chat_history" not in st.session_state:
         st.session_state.pdf_chat_history = {}  # key: filename -> [{"role": "user"/"assistant", "content": "..."}]
 
 
+def _unit_vector(emb) -> np.ndarray:
+    vec = np.array(emb, dtype=np.float32)
+    vec /= max(float(np.linalg.norm(vec)), 1e-12)
+    vec.flags.writeable = False  # shared via caches
+    return vec
+
+
+@lru_cache(maxsize=256)
+def _embed_query(question: str) -> np.ndarray:
+    """Embed a chat question once per process; repeated (e.g. preset) questions skip the API call."""
+    client = _client(os.getenv("OPENAI_API_KEY"))
+    q_emb = client.embeddings.create(model=EMBEDDING_MODEL, input=[question]).data[0].embedding
+    return _unit_vector(q_emb)
+
+
+def _query_vector(question: str) -> np.ndarray:
+    vec = _PRESET_EMBS.get(question)
+    return vec if vec is not None else _embed_query(question)
+
+
+def _make_index(chunks: list[str], embs) -> dict:
+    """Pack chunks into one string buffer plus an [N+1] offsets array (chunk i is buf[offsets[i]:offsets[i+1]])."""
+    offsets = np.fromiter(accumulate((len(c) for c in chunks), initial=0), dtype=np.int64, count=len(chunks) + 1)
+    return {"buf": "".join(chunks), "offsets": offsets, "embs": embs}
+
+
+def _get_chunk(index: dict, i: int) -> str:
+    offsets = index["offsets"]
+    return index["buf"][offsets[i]:offsets[i + 1]]
+
+
+def _index_cache_paths(filename: str, mtime: float, chunk_size: int, overlap: int) -> tuple[str, str]:
+    """Return the (.npz, .json) paths of the on-disk index cache for a PDF."""
+    kind = "i8" if simsimd is not None else "f16"
+    stem = f".cache_{filename}_{int(mtime)}_{chunk_size}_{overlap}_{EMBEDDING_MODEL}_{kind}"
+    base = os.path.join(PDF_FOLDER, stem)
+    return base + ".npz", base + ".json"
+
+
+def _load_index_cache(filename: str, mtime: float, chunk_size: int, overlap: int):
+    npz_path, json_path = _index_cache_paths(filename, mtime, chunk_size, overlap)
+    try:
+        with np.load(npz_path) as data:
+            embs = data["embs"]
+            offsets = data["offsets"]
+        with open(json_path, "r", encoding="utf-8") as f:
+            buf = json.load(f)
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+    if not isinstance(buf, str):
+        return None
+    return {"buf": buf, "offsets": offsets, "embs": embs}
+
+
+def _replace_atomically(path: str, write):
+    """Write via a temp file in the same folder and rename it over `path`, so readers
+    (other sessions, or a later run after a crash) never see a half-written file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _save_index_cache(filename: str, mtime: float, chunk_size: int, overlap: int, idx: dict):
+    npz_path, json_path = _index_cache_paths(filename, mtime, chunk_size, overlap)
+    try:
+        _replace_atomically(json_path, lambda f: f.write(json.dumps(idx["buf"], ensure_ascii=False).encode("utf-8")))
+        _replace_atomically(npz_path, lambda f: np.savez(f, embs=idx["embs"], offsets=idx["offsets"]))
+    except OSError:
+        # Read-only deployments simply skip the disk cache
+        pass
+
+
 def _build_index_for_pdf(filename: str, chunk_size=1000, overlap=200):
     """Build or reuse an embedding index for the given PDF (no spinners)."""
     _ensure_session_structs()
@@ -61,6 +175,20 @@ def _build_index_for_pdf(filename: str, chunk_size=1000, overlap=200):
         if old_key[0] == filename and old_key != key:
             del st.session_state.pdf_chat_indexes[old_key]
 
+    # Without the SDK or a key the chat falls back to the first chunks, which must not
+    # carry embeddings (querying them would need an OpenAI call)
+    api_key = os.getenv("OPENAI_API_KEY")
+    can_embed = (OpenAI is not None) and bool(api_key)
+
+    # Reuse an index persisted by an earlier session
+    idx = _load_index_cache(filename, mtime, chunk_size, overlap)
+    if idx is not None:
+        if not can_embed:
+            _need_openai_warning()
+            idx = {**idx, "embs": None}
+        st.session_state.pdf_chat_indexes[key] = idx
+        return idx
+
     # No spinner: just do the work
     text = extract_text_from_pdf(full_path)
     if not text.strip():
@@ -68,46 +196,91 @@ def _build_index_for_pdf(filename: str, chunk_size=1000, overlap=200):
         return None
     chunks = chunk_text(text, chunk_size=chunk_size, overlap=overlap)
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if (OpenAI is None) or (not api_key):
+    if not can_embed:
         _need_openai_warning()
-        idx = {"chunks": chunks, "embs": None}
+        idx = _make_index(chunks, None)
         st.session_state.pdf_chat_indexes[key] = idx
         return idx
 
-    client = OpenAI(api_key=api_key)
-    model = "text-embedding-3-small"
-    embs = []
+    client = _client(api_key)
+    model = EMBEDDING_MODEL
     batch_size = 96
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i: i + batch_size]
-        resp = client.embeddings.create(model=model, input=batch)
-        embs.extend([np.array(d.embedding, dtype=np.float32) for d in resp.data])
-    embs = np.vstack(embs) if embs else None
+    batches = [chunks[i: i + batch_size] for i in range(0, len(chunks), batch_size)]
+
+    # Piggyback the preset questions on the first batch so they cost no extra round-trip
+    presets = [q for q in PRESET_QUESTIONS.values() if q not in _PRESET_EMBS]
+    if batches and presets:
+        batches[0] = presets + batches[0]
+
+    def embed_batch(batch):
+        return client.embeddings.create(model=model, input=batch)
 
-    idx = {"chunks": chunks, "embs": embs}
+    # Batches are network-bound: keep several requests in flight at once
+    embs = []
+    with ThreadPoolExecutor(max_workers=max(1, min(len(batches), 8))) as ex:
+        for resp in ex.map(embed_batch, batches):
+            embs.extend([np.array(d.embedding, dtype=np.float32) for d in resp.data])
+    if batches and presets:
+        for q, emb in zip(presets, embs[:len(presets)]):
+            _PRESET_EMBS[q] = _unit_vector(emb)
+        del embs[:len(presets)]
+    if embs:
+        # L2-normalize once so retrieval is a single dot product per chunk
+        embs = np.ascontiguousarray(np.vstack(embs), dtype=np.float32)
+        embs /= np.linalg.norm(embs, axis=1, keepdims=True).clip(min=1e-12)
+        if simsimd is not None:
+            # int8 rows are 4x smaller and hit SimSIMD's integer dot-product kernels
+            embs = _quantize_int8(embs)
+        else:
+            # Half precision is plenty for top-k ranking and halves session memory
+            embs = embs.astype(np.float16)
+    else:
+        embs = None
+
+    idx = _make_index(chunks, embs)
+    if embs is not None:
+        _save_index_cache(filename, mtime, chunk_size, overlap, idx)
     st.session_state.pdf_chat_indexes[key] = idx
     return idx
 
 
 def _retrieve_top_chunks(index, question: str, k: int = 4):
     """Return top-k chunk strings most similar to the question."""
-    chunks = index["chunks"]
     embs = index["embs"]
 
     if embs is None:
         # No embeddings available (no SDK/API key) – naive fallback
-        return chunks[:k]
-
-    api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
-    q_emb = client.embeddings.create(model="text-embedding-3-small", input=[question]).data[0].embedding
-    q_vec = np.array(q_emb, dtype=np.float32)
-
-    sims = [(_cosine_sim(q_vec, embs[i]), i) for i in range(len(chunks))]
-    sims.sort(reverse=True, key=lambda x: x[0])
-    top_idxs = [idx for _, idx in sims[:k]]
-    return [chunks[i] for i in top_idxs]
+        n_chunks = len(index["offsets"]) - 1
+        return [_get_chunk(index, i) for i in range(min(k, n_chunks))]
+
+    k = min(k, len(embs))
+    if k <= 0:
+        # Also keeps an empty matrix away from simsimd.cdist, which rejects it
+        return []
+
+    q_vec = _query_vector(question)
+
+    if embs.dtype == np.int8:
+        q_i8 = _quantize_int8(q_vec.reshape(1, -1))
+        sims = 1.0 - np.asarray(simsimd.cdist(q_i8, embs, metric="cosine")).ravel()
+    else:
+        # float16 rows are only stored when simsimd is missing (the cache file name records
+        # the kind). Rows are unit-length, so one matmul yields all cosine similarities;
+        # upcast them so the product runs through BLAS
+        sims = embs.astype(np.float32, copy=False) @ q_vec
+    # Partial O(N) selection of the k best, then order just those k
+    top_idxs = np.argpartition(-sims, k - 1)[:k]
+    top_idxs = top_idxs[np.argsort(-sims[top_idxs])]
+    return [_get_chunk(index, i) for i in top_idxs]
+
+
+_SYSTEM_MSG = {
+    "role": "system",
+    "content": (
+        "You are a helpful assistant answering questions strictly using the provided PDF excerpts. "
+        "If the answer is not in the excerpts, say you don't know and suggest where in the PDF to look."
+    ),
+}
 
 
 def _answer_with_context(question: str, context_chunks: list[str]) -> str:
@@ -121,15 +294,12 @@ def _answer_with_context(question: str, context_chunks: list[str]) -> str:
                 + "\n\n---\n\n".join(context_chunks)
         )
 
-    client = OpenAI(api_key=api_key)
-    system = (
-        "You are a helpful assistant answering questions strictly using the provided PDF excerpts. "
-        "If the answer is not in the excerpts, say you don't know and suggest where in the PDF to look."
-    )
+    client = _client(api_key)
     context_block = "\n\n---\n\n".join(context_chunks)
 
+    # Stateless: each call sends only the system prompt and this question, never earlier turns
     msg = [
-        {"role": "system", "content": system},
+        _SYSTEM_MSG,
         {
             "role": "user",
             "content": (
@@ -155,14 +325,18 @@ def _answer_with_context(question: str, context_chunks: list[str]) -> str:
 # ----------------------------
 # Topic → PDF resolution utils
 # ----------------------------
-def _normalize_tokens(s: str) -> list[str]:
+_SEP_RE = re.compile(r"[_\-]+")
+_NONALNUM_RE = re.compile(r"[^a-z0-9\s]+")
+# Lightly downweight generic words
+_STOP_TOKENS = frozenset({"chapter", "chap", "ch", "pdf", "unit", "topic"})
+
+
+@lru_cache(maxsize=256)
+def _normalize_tokens(s: str) -> tuple[str, ...]:
     base = os.path.splitext(s)[0].lower()
-    base = re.sub(r"[_\-]+", " ", base)
-    base = re.sub(r"[^a-z0-9\s]+", " ", base)
-    tokens = base.split()
-    # Lightly downweight generic words
-    stop = {"chapter", "chap", "ch", "pdf", "unit", "topic"}
-    return [t for t in tokens if t not in stop]
+    base = _SEP_RE.sub(" ", base)
+    base = _NONALNUM_RE.sub(" ", base)
+    return tuple(t for t in base.split() if t not in _STOP_TOKENS)
 
 
 def _score_match(topic: str, filename: str) -> int:
@@ -171,7 +345,14 @@ def _score_match(topic: str, filename: str) -> int:
     return sum(1 for tok in f_tokens if tok in t_tokens)
 
 
-def _resolve_pdf_for_topic(topic: str, pdf_files: list[str]) -> Optional[str]:
+@st.cache_data(ttl=60, show_spinner=False)
+def _list_pdfs(folder_mtime: float) -> list[str]:
+    """Sorted PDF filenames in PDF_FOLDER; `folder_mtime` keys the cache so edits invalidate it."""
+    return sorted(f for f in os.listdir(PDF_FOLDER) if f.lower().endswith(".pdf"))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _resolve_pdf_for_topic(topic: str, pdf_files: tuple[str, ...]) -> Optional[str]:
     """Pick the most likely PDF for a given topic string."""
     if not pdf_files:
         return None
@@ -214,7 +395,7 @@ def render_pdf_chat(selected_topic: Optional[str] = None):
         st.sidebar.error(f"Folder not found: {PDF_FOLDER}")
         return
 
-    pdf_files = sorted([f for f in os.listdir(PDF_FOLDER) if f.lower().endswith(".pdf")])
+    pdf_files = _list_pdfs(os.path.getmtime(PDF_FOLDER))
     if not pdf_files:
         st.sidebar.info("No PDF files found in the gaddis_files folder.")
         return
@@ -226,7 +407,7 @@ def render_pdf_chat(selected_topic: Optional[str] = None):
         return
 
     # Map the topic to a concrete PDF file
-    resolved = _resolve_pdf_for_topic(topic, pdf_files)
+    resolved = _resolve_pdf_for_topic(topic, tuple(pdf_files))
     if not resolved:
         st.sidebar.error(
             f"Couldn’t find a PDF that matches **{topic}**.\n\n"
@@ -258,13 +439,7 @@ def render_pdf_chat(selected_topic: Optional[str] = None):
     # --- Radio-based prompts (quiz-style) ---
     st.caption(f"Chatting about: **{topic}**  ·  using file: `{resolved}`")
     st.sidebar.markdown("**Ask about this PDF**")
-    prompt_choices = [
-        "Give me a concise summary",
-        "List the key concepts",
-        "Explain an important code example",
-        "What are the most common pitfalls?",
-        "Custom question …",
-    ]
+    prompt_choices = [*PRESET_QUESTIONS, "Custom question …"]
     choice = st.sidebar.radio(
         "Choose a question type",
         prompt_choices,
@@ -288,14 +463,8 @@ def render_pdf_chat(selected_topic: Optional[str] = None):
         st.rerun()
 
     def materialize_question(sel: str) -> str:
-        if sel == "Give me a concise summary":
-            return "Summarize the PDF in 5–7 bullet points focusing on the main ideas."
-        if sel == "List the key concepts":
-            return "List the key concepts and define each in one sentence."
-        if sel == "Explain an important code example":
-            return "Pick one important code example from the text and explain how it works step by step."
-        if sel == "What are the most common pitfalls?":
-            return "What common mistakes or pitfalls should a learner avoid, according to this PDF?"
+        if sel in PRESET_QUESTIONS:
+            return PRESET_QUESTIONS[sel]
         # Custom
         return custom_q.strip()
 
@@ -1,4 +1,6 @@
 import os
+import tempfile
+from functools import lru_cache
 
 import fitz  # PyMuPDF
 
@@ -7,28 +9,70 @@ CHUNK_SIZE = 1000
 OVERLAP = 200
 
 
+def _parse_pdf_text(pdf_path):
+    """Runs PyMuPDF over every page of the PDF."""
+    # Plain-text extraction without ligature glyphs; the chunker needs nothing else
+    flags = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES
+    try:
+        with fitz.open(pdf_path) as doc:
+            return "".join(page.get_text("text", flags=flags) for page in doc)
+    except Exception as e:
+        print(f"❌ Failed to extract text from {pdf_path}: {e}")
+        return ""
+
+
+@lru_cache(maxsize=32)
+def _extract_cached(pdf_path, mtime):
+    """
+    Extracts text once per (path, mtime), reusing a `.txt` sidecar across restarts.
+    The sidecar's first line records the PDF mtime it was extracted from; only an exact
+    match counts, so a PDF replaced by one with an older mtime is re-extracted.
+    """
+    sidecar = pdf_path + ".txt"
+    header = f"{mtime!r}\n"
+    try:
+        with open(sidecar, "r", encoding="utf-8", newline="") as f:
+            if f.readline() == header:
+                return f.read()
+    except OSError:
+        pass
+
+    text = _parse_pdf_text(pdf_path)
+    if text:
+        # Write a temp file and rename it into place: a concurrent reader must never see a
+        # truncated sidecar under a valid header
+        try:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(sidecar) or ".", suffix=".tmp")
+        except OSError:
+            return text
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                f.write(header)
+                f.write(text)
+            os.replace(tmp, sidecar)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+    return text
+
+
 def extract_text_from_pdf(pdf_path):
     """Extracts full text from a PDF file."""
     try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
-    except Exception as e:
+        mtime = os.path.getmtime(pdf_path)
+    except OSError as e:
         print(f"❌ Failed to extract text from {pdf_path}: {e}")
         return ""
+    return _extract_cached(pdf_path, mtime)
 
 
 def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP):
     """Chunks text into overlapping segments for GPT context windows."""
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(start + chunk_size, len(text))
-        chunks.append(text[start:end].strip())
-        start += chunk_size - overlap
-    return chunks
+    text = text.strip()
+    step = chunk_size - overlap
+    return [text[start:start + chunk_size] for start in range(0, len(text), step)]
 
 
 def load_topic_contexts(topics):
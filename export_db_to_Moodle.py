@@ -9,7 +9,9 @@ offer a direct browser download in Streamlit.
 from __future__ import annotations
 
 import argparse
-from typing import Iterable, List, Optional
+import io
+from functools import lru_cache
+from typing import BinaryIO, Callable, Iterable, List, Optional, TextIO, Union
 from xml.sax.saxutils import escape
 
 # Try Streamlit for in-app notifications; fall back to no-ops outside Streamlit
@@ -22,26 +24,28 @@ except Exception:  # pragma: no cover
 from firebase_admin import firestore
 from firebase_backend import initialize_firebase  # provided in your project
 
+# Fields read by _validate_question/_question_to_xml; nothing else is fetched
+_EXPORT_FIELDS = ["question", "options", "answer", "explanation", "topic"]
 
+
+@lru_cache(maxsize=4096)
 def _xml_text(s: str) -> str:
-    """Escape text for inclusion inside Moodle <text> elements."""
+    """Escape text for inclusion inside Moodle <text> elements (memoized; options repeat a lot)."""
     if s is None:
         return ""
-    return escape(str(s), entities={'\"': "&quot;", \"'\": "&apos;"})
+    return escape(str(s), entities={'"': "&quot;", "'": "&apos;"})
 
 
 def _iter_questions(collection: str, limit: Optional[int]) -> Iterable[dict]:
-    """Stream questions from Firestore."""
+    """Stream questions from Firestore (only the exported fields, limit applied server-side)."""
     db = firestore.client()
-    docs = db.collection(collection).stream()
-    count = 0
-    for doc in docs:
+    query = db.collection(collection).select(_EXPORT_FIELDS)
+    if limit is not None:
+        query = query.limit(limit)
+    for doc in query.stream():
         q = doc.to_dict() or {}
         if q:  # only yield non-empty records
             yield q
-            count += 1
-            if limit is not None and count >= limit:
-                break
 
 
 def _validate_question(q: dict) -> Optional[str]:
@@ -51,14 +55,14 @@ def _validate_question(q: dict) -> Optional[str]:
         if k not in q or q[k] in (None, "", []):
             return f"missing required field '{k}'"
 
-    options: List[str] = [str(o) for o in list(q["options"])]
+    options: List[str] = list(map(str, q["options"]))
     answer: str = str(q["answer"])
 
-    if answer not in options:
+    if answer not in set(options):
         return "answer is not among options"
 
     # exactly one correct option
-    if sum(1 for o in options if o == answer) != 1:
+    if options.count(answer) != 1:
         return "exactly one option must equal the answer"
 
     return None
@@ -74,32 +78,76 @@ def _question_to_xml(idx: int, q: dict, single: bool = True, shuffleanswers: boo
 
     name_text = f"Q{idx}: {topic}" if topic else f"Q{idx}"
 
-    lines = []
-    lines.append('  <question type="multichoice">')
-    lines.append(f"    <name><text>{_xml_text(name_text)}</text></name>")
-    lines.append('    <questiontext format="html">')
-    lines.append(f"      <text>{_xml_text(question)}</text>")
-    lines.append("    </questiontext>")
-    lines.append("    <generalfeedback>")
-    lines.append(f"      <text>{_xml_text(feedback)}</text>")
-    lines.append("    </generalfeedback>")
-    lines.append("    <defaultgrade>1.0000000</defaultgrade>")
-    lines.append("    <penalty>0.0000000</penalty>")
-    lines.append(f"    <single>{'true' if single else 'false'}</single>")
-    lines.append(f"    <shuffleanswers>{'true' if shuffleanswers else 'false'}</shuffleanswers>")
-    lines.append("    <answernumbering>abc</answernumbering>")
-
-    for opt in options:
-        fraction = "100" if opt == answer else "0"
-        lines.append(f'    <answer fraction="{fraction}" format="html">')
-        lines.append(f"      <text>{_xml_text(opt)}</text>")
-        lines.append("      <feedback>")
-        lines.append(f"        <text>{'Correct.' if fraction == '100' else 'Incorrect.'}</text>")
-        lines.append("      </feedback>")
-        lines.append("    </answer>")
-
-    lines.append("  </question>")
-    return "\\n".join(lines)
+    # A string template rather than ElementTree: the stdlib serializer is pure Python and
+    # ~20x slower here; every interpolated value still goes through _xml_text.
+    answers_xml = "".join(
+        f'    <answer fraction="{"100" if opt == answer else "0"}" format="html">\n'
+        f"      <text>{_xml_text(opt)}</text>\n"
+        "      <feedback>\n"
+        f"        <text>{'Correct.' if opt == answer else 'Incorrect.'}</text>\n"
+        "      </feedback>\n"
+        "    </answer>\n"
+        for opt in options
+    )
+
+    return (
+        '  <question type="multichoice">\n'
+        f"    <name><text>{_xml_text(name_text)}</text></name>\n"
+        '    <questiontext format="html">\n'
+        f"      <text>{_xml_text(question)}</text>\n"
+        "    </questiontext>\n"
+        "    <generalfeedback>\n"
+        f"      <text>{_xml_text(feedback)}</text>\n"
+        "    </generalfeedback>\n"
+        "    <defaultgrade>1.0000000</defaultgrade>\n"
+        "    <penalty>0.0000000</penalty>\n"
+        f"    <single>{'true' if single else 'false'}</single>\n"
+        f"    <shuffleanswers>{'true' if shuffleanswers else 'false'}</shuffleanswers>\n"
+        "    <answernumbering>abc</answernumbering>\n"
+        f"{answers_xml}"
+        "  </question>"
+    )
+
+
+def _write_moodle_xml(
+    out: TextIO,
+    collection: str,
+    *,
+    limit: Optional[int],
+    category: Optional[str],
+    shuffleanswers: bool,
+    on_skip: Optional[Callable[[str], None]] = None,
+) -> int:
+    """
+    Stream the Moodle XML document to `out` question by question; return the number written.
+    Invalid questions are skipped and reported through `on_skip` (default: a sidebar warning).
+    """
+    if on_skip is None:
+        on_skip = st.sidebar.warning if st is not None else (lambda msg: None)
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<quiz>\n')
+
+    # Optional category (Moodle uses a special 'category' question to set the context)
+    if category:
+        out.write(
+            '  <question type="category">\n'
+            "    <category>\n"
+            f"      <text>$course$/{_xml_text(category)}</text>\n"
+            "    </category>\n"
+            "  </question>\n"
+        )
+
+    written = 0
+    for idx, q in enumerate(_iter_questions(collection, limit=limit), start=1):
+        err = _validate_question(q)
+        if err:
+            on_skip(f"Skipping invalid question {idx}: {err}")
+            continue
+        out.write(_question_to_xml(idx, q, single=True, shuffleanswers=shuffleanswers))
+        out.write("\n")
+        written += 1
+
+    out.write("</quiz>\n")
+    return written
 
 
 def build_moodle_xml_from_firestore(
@@ -117,65 +165,53 @@ def build_moodle_xml_from_firestore(
     # Initialize Firebase
     initialize_firebase(credential_path)
 
-    parts: List[str] = []
-    parts.append('<?xml version="1.0" encoding="UTF-8"?>')
-    parts.append("<quiz>")
-
-    # Optional category (Moodle uses a special 'category' question to set the context)
-    if category:
-        parts.append('  <question type="category">')
-        parts.append("    <category>")
-        parts.append(f"      <text>$course$/{_xml_text(category)}</text>")
-        parts.append("    </category>")
-        parts.append("  </question>")
-
-    written = 0
-    for idx, q in enumerate(_iter_questions(collection, limit=limit), start=1):
-        err = _validate_question(q)
-        if err:
-            if st is not None:
-                st.sidebar.warning(f"Skipping invalid question {idx}: {err}")
-            continue
-        parts.append(_question_to_xml(idx, q, single=True, shuffleanswers=shuffleanswers))
-        written += 1
-
-    parts.append("</quiz>")
-    xml = "\\n".join(parts)
+    buf = io.StringIO()
+    written = _write_moodle_xml(
+        buf, collection, limit=limit, category=category, shuffleanswers=shuffleanswers
+    )
 
     if st is not None:
         st.sidebar.success(f"Prepared {written} questions for download.")
-    return xml
+    return buf.getvalue()
 
 
 def export_db_to_Moodle(
     credential_path: str,
-    output_path: str,
+    output_path: Union[str, BinaryIO],
     collection: str = "quiz_questions",
     *,
     limit: Optional[int] = None,
     category: Optional[str] = None,
-    shuffleanswers: bool = True
+    shuffleanswers: bool = True,
+    on_skip: Optional[Callable[[str], None]] = None
 ) -> int:
     """
-    Export Firestore quiz questions to a Moodle XML file (on disk).
+    Export Firestore quiz questions to a Moodle XML file (on disk), or into a binary
+    file-like object such as io.BytesIO (UTF-8 encoded; the object is left open).
+    Questions are written as they stream in, so memory stays flat for large collections.
+    `on_skip` receives one message per invalid question (default: a sidebar warning).
 
     Returns:
         The number of questions successfully written.
     """
-    # Build XML in-memory first
-    xml = build_moodle_xml_from_firestore(
-        credential_path=credential_path,
-        collection=collection,
-        limit=limit,
-        category=category,
-        shuffleanswers=shuffleanswers,
-    )
+    # Initialize Firebase
+    initialize_firebase(credential_path)
 
-    # Write the file
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(xml)
+    if hasattr(output_path, "write"):
+        out = io.TextIOWrapper(output_path, encoding="utf-8")
+        try:
+            return _write_moodle_xml(
+                out, collection, limit=limit, category=category, shuffleanswers=shuffleanswers,
+                on_skip=on_skip
+            )
+        finally:
+            out.detach()  # flushes, without closing the caller's stream
 
-    return xml.count("<question type=\"multichoice\">")
+    with open(output_path, "w", encoding="utf-8") as f:
+        return _write_moodle_xml(
+            f, collection, limit=limit, category=category, shuffleanswers=shuffleanswers,
+            on_skip=on_skip
+        )
 
 
 def _parse_args() -> argparse.Namespace:  # CLI remains supported
@@ -1,26 +1,36 @@
 # export_quiz_to_PDF.py
+import copy
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 
-from fpdf import FPDF, HTMLMixin
+from fontTools import ttLib
+from fpdf import FPDF, XPos, YPos
 
 FONT_DIR = Path(__file__).parent / "fonts"
 
+# DejaVu styles the quiz actually sets (body, bold headings, italic footer).
+# fpdf2 fully parses every TTF passed to add_font, so unused styles are not registered.
+_FONT_FILES = {
+    "": str(FONT_DIR / "DejaVuSans.ttf"),
+    "B": str(FONT_DIR / "DejaVuSans-Bold.ttf"),
+    "I": str(FONT_DIR / "DejaVuSans-Oblique.ttf"),
+}
 
-class QuizPDF(FPDF, HTMLMixin):
+
+class QuizPDF(FPDF):
     def __init__(self, quiz_title):
         super().__init__()
         self.quiz_title = quiz_title
         self.set_auto_page_break(auto=True, margin=15)
 
         # Register Unicode TTFs
-        self.add_font("DejaVu", "", str(FONT_DIR / "DejaVuSans.ttf"), uni=True)
-        self.add_font("DejaVu", "B", str(FONT_DIR / "DejaVuSans-Bold.ttf"), uni=True)
-        self.add_font("DejaVu", "I", str(FONT_DIR / "DejaVuSans-Oblique.ttf"), uni=True)
-        self.add_font("DejaVu", "BI", str(FONT_DIR / "DejaVuSans-BoldOblique.ttf"), uni=True)
+        for style, fname in _FONT_FILES.items():
+            self.add_font("DejaVu", style, fname)
 
     def header(self):
         self.set_font("DejaVu", "B", 14)  # was Helvetica
-        self.cell(0, 10, self.quiz_title, ln=True, align="C")
+        self.cell(0, 10, self.quiz_title, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
         self.ln(5)
 
     def footer(self):
@@ -29,8 +39,40 @@ class QuizPDF(FPDF, HTMLMixin):
         self.cell(0, 10, f"Page {self.page_no()}/{{nb}}", align="C")
 
 
+@lru_cache(maxsize=1)
+def _blank_quiz_pdf():
+    """Pristine document with the fonts already parsed; only ever copied, never rendered into."""
+    return QuizPDF("")
+
+
+def _new_quiz_pdf(quiz_title):
+    # Copying the template reuses its glyph widths and cmap instead of rebuilding them from the
+    # TTFs. The copy shares the fontTools objects, which fpdf2 subsets in place on output, so each
+    # export gets freshly opened (lazy, near-free) ones.
+    pdf = copy.deepcopy(_blank_quiz_pdf())
+    for font in pdf.fonts.values():
+        font.ttfont = ttLib.TTFont(font.ttffile, recalcTimestamp=False, lazy=True)
+    pdf.quiz_title = quiz_title
+    pdf.set_creation_date(datetime.now(timezone.utc))
+    return pdf
+
+
+def _write_text(pdf, w, h, text):
+    """multi_cell, minus fpdf2's line breaker for the common case of text that fits on one line."""
+    width = w or (pdf.w - pdf.r_margin - pdf.x)
+    if "\n" not in text and pdf.get_string_width(text) < width - 2 * pdf.c_margin:
+        # Same position afterwards as multi_cell's defaults
+        pdf.cell(w, h, text, new_x=XPos.RIGHT, new_y=YPos.NEXT)
+    else:
+        pdf.multi_cell(w, h, text)
+
+
 def generate_quiz_pdf(quiz_data, quiz_title="Python quiz and solutions", output_path=None):
-    pdf = QuizPDF(quiz_title)
+    """
+    Render the quiz and its answer key. Writes to `output_path` (a file path or a writable
+    binary stream) and returns it when given, otherwise returns the PDF as bytes.
+    """
+    pdf = _new_quiz_pdf(quiz_title)
     pdf.alias_nb_pages()
     pdf.add_page()
     pdf.set_font("DejaVu", size=12)  # was Helvetica
@@ -38,45 +80,39 @@ def generate_quiz_pdf(quiz_data, quiz_title="Python quiz and solutions", output_
     # Quiz Questions Section
     avail = pdf.w - pdf.l_margin - pdf.r_margin
     indent = 4
+    option_width = avail - indent
 
     for idx, q in enumerate(quiz_data, start=1):
         pdf.set_font("DejaVu", "B", 12)  # was Helvetica
         pdf.set_x(pdf.l_margin)
-        pdf.multi_cell(avail, 8, f"{idx}. {q['question']}")
+        _write_text(pdf, avail, 8, f"{idx}. {q['question']}")
 
         pdf.set_font("DejaVu", "", 11)  # was Helvetica
-        if q.get("options"):
+        if q.get("options") and option_width > 0:
             for opt in q["options"]:
-                option_width = avail - indent
-                if option_width > 0:
-                    pdf.set_x(pdf.l_margin + indent)
-                    pdf.multi_cell(option_width, 6, f"- {opt}")
+                pdf.set_x(pdf.l_margin + indent)
+                _write_text(pdf, option_width, 6, f"- {opt}")
         pdf.ln(3)
 
     # Answers and Explanations Section
     pdf.add_page()
     pdf.set_font("DejaVu", "B", 14)  # was Helvetica
-    pdf.cell(0, 10, "Answers & Explanations", ln=True)
+    pdf.cell(0, 10, "Answers & Explanations", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
     pdf.ln(4)
 
     for idx, q in enumerate(quiz_data, start=1):
         pdf.set_font("DejaVu", "B", 12)  # was Helvetica
         pdf.set_x(pdf.l_margin)
-        pdf.multi_cell(0, 7, f"{idx}. Correct Answer: {q['answer']}")
+        _write_text(pdf, 0, 7, f"{idx}. Correct Answer: {q['answer']}")
         pdf.set_font("DejaVu", "", 11)  # was Helvetica
         explanation = q.get("explanation", "No explanation provided.")
         pdf.set_x(pdf.l_margin)
-        pdf.multi_cell(0, 6, f"Explanation: {explanation}")
+        _write_text(pdf, 0, 6, f"Explanation: {explanation}")
         pdf.ln(3)
 
     if output_path:
+        # fpdf2 accepts a path or a file-like sink here
         pdf.output(output_path)
         return output_path
 
-    # --- Changed section: make return robust across fpdf versions ---
-    result = pdf.output(dest="S")
-    if isinstance(result, (bytes, bytearray)):
-        # fpdf2 returns bytes/bytearray: pass through as bytes for Streamlit
-        return bytes(result)
-    # Older PyFPDF returned str: encode to bytes
-    return result.encode("latin-1")
+    return bytes(pdf.output())
@@ -1,8 +1,16 @@
 # export_snapshot.py
 import json
 
+import zstandard
 from firebase_admin import credentials, firestore, initialize_app
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_WRITE_BUFFER = 1 << 16
+
 
 def main():
     cred = credentials.Certificate("firebase_credentials.json")
@@ -12,11 +20,33 @@ def main():
     docs = db.collection("quiz_questions").stream()
     questions = [d.to_dict() for d in docs if d.to_dict()]
 
-    with open("questions_snapshot.json", "w", encoding="utf-8") as f:
-        json.dump(questions, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        # Serialized in one pass to UTF-8 bytes and written as a single chunk
+        with open("questions_snapshot.json", "wb", buffering=_WRITE_BUFFER) as f:
+            f.write(orjson.dumps(questions, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        # json.dump issues many small writes; a larger buffer batches them
+        with open("questions_snapshot.json", "w", encoding="utf-8", buffering=_WRITE_BUFFER) as f:
+            json.dump(questions, f, ensure_ascii=False, indent=2)
 
     print(f"Wrote {len(questions)} questions to questions_snapshot.json")
 
+    # Compressed copy for smaller deploys (SNAPSHOT_PATH=questions_snapshot.json.zst)
+    with open("questions_snapshot.json", "rb") as src, \
+            open("questions_snapshot.json.zst", "wb", buffering=_WRITE_BUFFER) as dst:
+        zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+    print(f"Wrote {len(questions)} questions to questions_snapshot.json.zst")
+
+    # Columnar copy for fast cold starts (SNAPSHOT_PATH=questions_snapshot.parquet)
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed; skipping questions_snapshot.parquet")
+        return
+    pq.write_table(pa.Table.from_pylist(questions), "questions_snapshot.parquet", compression="zstd")
+    print(f"Wrote {len(questions)} questions to questions_snapshot.parquet")
+
 
 if __name__ == "__main__":
     main()
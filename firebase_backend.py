@@ -1,11 +1,21 @@
+import hashlib
+import json
 import logging
 import random
+from itertools import islice
 
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
 
 logger = logging.getLogger(__name__)
 
+COLLECTION = "quiz_questions"
+# Fields the quiz reads; the dedupe_hash/rand_key index fields stay on the server
+_QUIZ_FIELDS = ["question", "options", "answer", "explanation", "topic"]
+# Firestore caps a single batched write at 500 operations
+_MAX_BATCH_WRITES = 500
+
 
 def initialize_firebase(credential_path: str):
     if not firebase_admin._apps:
@@ -14,6 +24,17 @@ def initialize_firebase(credential_path: str):
         logger.debug("✅ Firebase initialized.")
 
 
+_DB = None
+
+
+def _db():
+    """Process-wide Firestore client, so every call reuses one gRPC channel and auth session."""
+    global _DB
+    if _DB is None:
+        _DB = firestore.client()
+    return _DB
+
+
 def are_questions_identical(q1: dict, q2: dict) -> bool:
     return (
             q1.get("question") == q2.get("question")
@@ -22,14 +43,56 @@ def are_questions_identical(q1: dict, q2: dict) -> bool:
     )
 
 
+def question_hash(q: dict) -> str:
+    """Stable fingerprint matching are_questions_identical (question, answer, set of options)."""
+    options = sorted({str(o) for o in q.get("options", [])})
+    payload = json.dumps([q.get("question"), q.get("answer"), options], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _indexed_fields(question_data: dict) -> dict:
+    """Fields stored on every doc so dedupe and random sampling can be answered by index lookups."""
+    return {"dedupe_hash": question_hash(question_data), "rand_key": random.random()}
+
+
+def _count(query) -> int:
+    # Server-side aggregation: one RPC instead of streaming every document
+    return int(query.count().get()[0][0].value)
+
+
+# Whether docs saved before dedupe_hash/rand_key existed are still in the collection.
+# Firestore leaves them out of queries on those fields, so until backfill_indexed_fields()
+# has run, lookups fall back to full scans. Checked once per process.
+_UNINDEXED_DOCS = None
+
+
+def _has_unindexed_docs(db) -> bool:
+    global _UNINDEXED_DOCS
+    if _UNINDEXED_DOCS is None:
+        col = db.collection(COLLECTION)
+        missing = _count(col) - _count(col.where(filter=FieldFilter("rand_key", ">=", 0.0)))
+        _UNINDEXED_DOCS = missing > 0
+        if _UNINDEXED_DOCS:
+            logger.warning(
+                f"{missing} quiz questions lack dedupe_hash/rand_key; falling back to full scans "
+                "until backfill_indexed_fields() is run."
+            )
+    return _UNINDEXED_DOCS
+
+
 def is_duplicate_question(new_question: dict) -> bool:
     try:
-        db = firestore.client()
-        docs = db.collection("quiz_questions").stream()
-        for doc in docs:
-            existing = doc.to_dict()
-            if are_questions_identical(existing, new_question):
-                return True
+        db = _db()
+        query = (
+            db.collection(COLLECTION)
+            .where(filter=FieldFilter("dedupe_hash", "==", question_hash(new_question)))
+            .limit(1)
+        )
+        if any(True for _ in query.stream()):
+            return True
+        if _has_unindexed_docs(db):
+            docs = db.collection(COLLECTION).select(_QUIZ_FIELDS).stream()
+            return any(are_questions_identical(doc.to_dict() or {}, new_question) for doc in docs)
         return False
     except Exception as e:
         logger.debug(f"❌ Error checking duplicates: {e}")
@@ -39,9 +102,9 @@ def is_duplicate_question(new_question: dict) -> bool:
 def save_quiz_question(topic: str, question_data: dict) -> str:
     # Disabled for deployment – skipping database save
     try:
-        db = firestore.client()
-        question_data_with_topic = {**question_data, "topic": topic}
-        doc_ref = db.collection("quiz_questions").add(question_data_with_topic)
+        db = _db()
+        question_data_with_topic = {**question_data, "topic": topic, **_indexed_fields(question_data)}
+        doc_ref = db.collection(COLLECTION).add(question_data_with_topic)
         return doc_ref[1].id
     except Exception as e:
         logger.debug(f"❌ Failed to save question: {e}")
@@ -49,12 +112,50 @@ def save_quiz_question(topic: str, question_data: dict) -> str:
     return ""
 
 
+def save_quiz_questions_bulk(topic: str, items) -> list:
+    """Save many questions with one batched commit per 500 docs; returns the new doc ids."""
+    ids = []
+    try:
+        db = _db()
+        col = db.collection(COLLECTION)
+        it = iter(items)
+        while chunk := list(islice(it, _MAX_BATCH_WRITES)):
+            batch = db.batch()
+            refs = [col.document() for _ in chunk]
+            for ref, question_data in zip(refs, chunk):
+                batch.set(ref, {**question_data, "topic": topic, **_indexed_fields(question_data)})
+            batch.commit()
+            ids.extend(ref.id for ref in refs)
+    except Exception as e:
+        logger.debug(f"❌ Failed to bulk-save questions: {e}")
+    return ids
+
+
 def get_random_quiz_questions(limit=10) -> list:
     try:
-        db = firestore.client()
-        docs = db.collection("quiz_questions").stream()
-        questions = [doc.to_dict() for doc in docs if doc.to_dict()]
-        return random.sample(questions, min(limit, len(questions)))
+        db = _db()
+        query = db.collection(COLLECTION).select(_QUIZ_FIELDS)
+        # Read `limit` docs upward from a random pivot on the indexed rand_key, wrapping around to 0
+        pivot = random.random()
+        docs = list(
+            query.where(filter=FieldFilter("rand_key", ">=", pivot)).order_by("rand_key").limit(limit).stream()
+        )
+        if len(docs) < limit:
+            docs += list(
+                query.where(filter=FieldFilter("rand_key", "<", pivot))
+                .order_by("rand_key")
+                .limit(limit - len(docs))
+                .stream()
+            )
+        if len(docs) < limit:
+            # Docs without rand_key are invisible to the queries above: sample from a full scan
+            questions = [q for q in (doc.to_dict() for doc in query.stream()) if q]
+            if len(questions) > len(docs):
+                logger.warning("Some quiz questions lack rand_key; run backfill_indexed_fields().")
+            return random.sample(questions, min(limit, len(questions)))
+        questions = [q for q in (doc.to_dict() for doc in docs) if q]
+        random.shuffle(questions)
+        return questions
     except Exception as e:
         logger.debug(f"❌ Failed to retrieve questions: {e}")
         return []
@@ -62,10 +163,33 @@ def get_random_quiz_questions(limit=10) -> list:
 
 def get_quiz_question_count() -> int:
     try:
-        db = firestore.client()
-        docs = db.collection("quiz_questions").stream()
-        count = sum(1 for _ in docs)
-        return count
+        return _count(_db().collection(COLLECTION))
     except Exception as e:
         logger.debug(f"❌ Failed to count quiz questions: {e}")
         return 0
+
+
+def backfill_indexed_fields(batch_size: int = 500) -> int:
+    """
+    One-time migration: add dedupe_hash/rand_key to docs saved before those fields existed,
+    so duplicate checks and random sampling see them. Returns the number of docs updated.
+    """
+    db = _db()
+    batch = db.batch()
+    pending = updated = 0
+    for doc in db.collection(COLLECTION).stream():
+        data = doc.to_dict() or {}
+        if not data or ("dedupe_hash" in data and "rand_key" in data):
+            continue
+        batch.update(doc.reference, _indexed_fields(data))
+        pending += 1
+        if pending == batch_size:
+            batch.commit()
+            updated += pending
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+        updated += pending
+    global _UNINDEXED_DOCS
+    _UNINDEXED_DOCS = False
+    return updated
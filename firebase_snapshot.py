@@ -1,9 +1,22 @@
 
 # firebase_backend.py — snapshot-only runtime (no Firestore I/O)
+import hashlib
 import json
 import os
 import random
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+# Optional streaming parser: lets the count be taken without materializing every question
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Optional fast JSON parser; stdlib json is used when it is missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Path to the snapshot; default is next to this file
 _SNAPSHOT_PATH = os.getenv(
@@ -14,6 +27,59 @@ _SNAPSHOT_PATH = os.getenv(
 # Loaded once and reused
 _SNAPSHOT_DATA: List[Dict] = []
 _LOADED = False
+# Question count, computed by a streaming pass if the data itself has not been loaded
+_SNAPSHOT_COUNT: Optional[int] = None
+
+
+def _open_sequential(path: str):
+    f = open(path, "rb")
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    return f
+
+
+def _snapshot_ext() -> str:
+    return os.path.splitext(_SNAPSHOT_PATH)[1].lower()
+
+
+def _count_snapshot() -> Optional[int]:
+    """Count questions without building their dicts; None if the format/deps don't allow it."""
+    ext = _snapshot_ext()
+    try:
+        if ext == ".parquet":
+            import pyarrow.parquet as pq  # heavy import, only needed in Parquet mode
+            return pq.ParquetFile(_SNAPSHOT_PATH).metadata.num_rows
+        if ext == ".json" and ijson is not None:
+            with _open_sequential(_SNAPSHOT_PATH) as f:
+                return sum(1 for prefix, event, _ in ijson.parse(f) if prefix == "item" and event == "start_map")
+    except FileNotFoundError:
+        return 0
+    return None
+
+
+def _loads(raw: bytes):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _read_snapshot(path: str) -> List[Dict]:
+    """Read the snapshot; Parquet and msgpack skip the JSON tokenizer entirely."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True).to_pylist()
+    if ext == ".msgpack":
+        import msgpack
+        with open(path, "rb") as f:
+            return msgpack.unpackb(f.read(), raw=False)
+    if path.lower().endswith(".json.zst"):
+        import zstandard
+        with _open_sequential(path) as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            return _loads(reader.read())
+    if orjson is not None:
+        with _open_sequential(path) as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 
 def _ensure_loaded():
@@ -21,8 +87,7 @@ def _ensure_loaded():
     if _LOADED:
         return
     try:
-        with open(_SNAPSHOT_PATH, "r", encoding="utf-8") as f:
-            _SNAPSHOT_DATA = json.load(f)
+        _SNAPSHOT_DATA = _read_snapshot(_SNAPSHOT_PATH)
     except FileNotFoundError:
         # No snapshot shipped; keep empty so the app still runs
         _SNAPSHOT_DATA = []
@@ -43,6 +108,13 @@ def are_questions_identical(q1: dict, q2: dict) -> bool:
     )
 
 
+def question_hash(q: dict) -> str:
+    """Same fingerprint as firebase_backend.question_hash (question, answer, set of options)."""
+    options = sorted({str(o) for o in q.get("options", [])})
+    payload = json.dumps([q.get("question"), q.get("answer"), options], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
 def is_duplicate_question(new_question: dict) -> bool:
     """No DB reads in snapshot mode."""
     return False
@@ -53,12 +125,25 @@ def save_quiz_question(topic: str, question_data: dict) -> str:
     return ""
 
 
+def save_quiz_questions_bulk(topic: str, items) -> list:
+    """Disabled in snapshot mode (no writes)."""
+    return []
+
+
 def get_random_quiz_questions(limit=10) -> list:
     _ensure_loaded()
     n = min(limit, len(_SNAPSHOT_DATA))
-    return random.sample(_SNAPSHOT_DATA, n)
+    # Sample indices so the work stays O(n), and use a per-call RNG so concurrent
+    # sessions don't serialize on the shared module-level Mersenne Twister.
+    rng = random.Random(os.urandom(8))
+    return [_SNAPSHOT_DATA[i] for i in rng.sample(range(len(_SNAPSHOT_DATA)), n)]
 
 
 def get_quiz_question_count() -> int:
-    _ensure_loaded()
-    return len(_SNAPSHOT_DATA)
+    global _SNAPSHOT_COUNT
+    if not _LOADED and _SNAPSHOT_COUNT is None:
+        _SNAPSHOT_COUNT = _count_snapshot()
+    if _LOADED or _SNAPSHOT_COUNT is None:
+        _ensure_loaded()
+        return len(_SNAPSHOT_DATA)
+    return _SNAPSHOT_COUNT
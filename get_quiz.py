@@ -1,27 +1,80 @@
+import asyncio
+import hashlib
 import logging
 import random
-from collections import defaultdict, deque
+import threading
+from collections import OrderedDict, defaultdict, deque
+from functools import lru_cache
 from os import getenv
-from typing import Dict, List, Optional, Iterable
+from typing import Callable, Dict, List, Optional, Iterable, Sequence
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultHttpxClient, OpenAI
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
 
+# Optional Aho-Corasick matcher: one pass over the text for any number of exclude terms
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Below this many terms a plain `in` scan per term beats building an automaton
+_AUTOMATON_MIN_TERMS = 8
+
+
+@lru_cache(maxsize=4096)
+def _lower(text: str) -> str:
+    """Study chunks are immutable and reused across questions, so lowercase each one once."""
+    return text.lower()
+
+
+@lru_cache(maxsize=64)
+def _exclusion_matcher(terms: tuple) -> Callable[[str], bool]:
+    """Predicate telling whether lowercased text contains any of the (lowercased) terms."""
+    if ahocorasick is not None and len(terms) >= _AUTOMATON_MIN_TERMS:
+        automaton = ahocorasick.Automaton()
+        for t in terms:
+            automaton.add_word(t, t)
+        automaton.make_automaton()
+        return lambda low: next(automaton.iter(low), None) is not None
+    return lambda low: any(t in low for t in terms)
+
+
+def _exclusion_terms(exclude_terms: Optional[Iterable[str]]) -> tuple:
+    return tuple(dict.fromkeys(t.lower() for t in exclude_terms if t)) if exclude_terms else ()
+
+
 def _filter_chunks(chunks: Iterable[str], exclude_terms: list[str]) -> list[str]:
-    if not exclude_terms:
+    terms = _exclusion_terms(exclude_terms)
+    if not terms:
         return list(chunks)
-    lows = [t.lower() for t in exclude_terms]
-    return [c for c in chunks if not any(t in c.lower() for t in lows)]
+    matches = _exclusion_matcher(terms)
+    return [c for c in chunks if not matches(_lower(c))]
+
+
+@lru_cache(maxsize=64)
+def _usable_chunks(chunks: tuple, terms: tuple) -> tuple:
+    """Filtered chunks for a frozen (tuple) topic context, computed once per term set."""
+    return tuple(_filter_chunks(chunks, list(terms)))
 
 
 def _violates_exclusions(text: str, exclude_terms: list[str]) -> bool:
-    if not exclude_terms:
+    terms = _exclusion_terms(exclude_terms)
+    if not terms:
         return False
-    low = text.lower()
-    return any(t in low for t in exclude_terms)
+    return _exclusion_matcher(terms)(text.lower())
+
+
+@lru_cache(maxsize=4)
+def _client(api_key: str) -> OpenAI:
+    """One client per API key, so consecutive questions reuse its HTTP/2 connection pool."""
+    return OpenAI(
+        api_key=api_key,
+        http_client=DefaultHttpxClient(http2=True, limits=httpx.Limits(max_keepalive_connections=10)),
+    )
 
 
 class QuizQuestion(BaseModel):
@@ -34,6 +87,14 @@ class QuizQuestion(BaseModel):
 # Keep a SMALL, per-topic memory of recent question stems to avoid repeats.
 _RECENT_QUESTION_STEMS: Dict[str, deque] = defaultdict(lambda: deque(maxlen=15))
 
+# Validated generations per (topic, study text, exclusions), reused to skip some LLM calls.
+# Hand-rolled LRU: cached dicts are copied on the way out, which lru_cache can't do.
+_GENERATION_CACHE: "OrderedDict[tuple, List[dict]]" = OrderedDict()
+_GENERATION_CACHE_SIZE = 512
+_GENERATIONS_PER_KEY = 3
+_CACHE_REUSE_PROBABILITY = 0.7  # the rest of the hits still generate, to keep variety
+_GENERATION_CACHE_LOCK = threading.Lock()
+
 # Single, stable system message (no ever-growing chat log)
 _BASE_SYSTEM = {
     "role": "system",
@@ -53,15 +114,50 @@ _BASE_SYSTEM = {
 }
 
 
-def _sample_context(context_chunks: List[str], max_chunks: int = 3) -> str:
-    """Randomly sample up to max_chunks distinct chunks and join them."""
+def _sample_chunks(context_chunks: Sequence[str], max_chunks: int = 3) -> List[str]:
+    """Randomly sample up to max_chunks distinct chunks, in random order."""
     if not context_chunks:
-        return ""
+        return []
     k = min(max_chunks, len(context_chunks))
-    sample = random.sample(context_chunks, k=k)
-    # Light shuffle to avoid deterministic ordering
-    random.shuffle(sample)
-    return "\n\n---\n\n".join(sample)
+    # random.sample already returns the picks in random order
+    return random.sample(context_chunks, k=k)
+
+
+def _generation_key(topic: str, chunks: List[str], exclude_terms: List[str]) -> tuple:
+    # Keyed on the chunk *set*: the same chunks in another order are the same study material
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in sorted(chunks):
+        h.update(chunk.encode("utf-8"))
+        h.update(b"\0")
+    return topic, h.hexdigest(), tuple(sorted(set(exclude_terms)))
+
+
+def _reuse_generation(key: tuple, topic: str, recent_stems: List[str]) -> Optional[Dict[str, str]]:
+    """Maybe return a cached question for `key` (not one asked recently), options reshuffled."""
+    if random.random() >= _CACHE_REUSE_PROBABILITY:
+        return None
+    with _GENERATION_CACHE_LOCK:
+        entries = _GENERATION_CACHE.get(key)
+        if not entries:
+            return None
+        _GENERATION_CACHE.move_to_end(key)
+        candidates = [q for q in entries if q["question"].strip() not in recent_stems]
+    if not candidates:
+        return None
+    quiz = dict(random.choice(candidates))
+    quiz["options"] = random.sample(quiz["options"], k=len(quiz["options"]))
+    _RECENT_QUESTION_STEMS[topic].append(quiz["question"].strip())
+    return quiz
+
+
+def _remember_generation(key: tuple, quiz: Dict[str, str]) -> None:
+    with _GENERATION_CACHE_LOCK:
+        entries = _GENERATION_CACHE.setdefault(key, [])
+        entries.append(dict(quiz))
+        del entries[:-_GENERATIONS_PER_KEY]
+        _GENERATION_CACHE.move_to_end(key)
+        while len(_GENERATION_CACHE) > _GENERATION_CACHE_SIZE:
+            _GENERATION_CACHE.popitem(last=False)
 
 
 def _make_prompt(topic: str, study_text: str, recent_stems: List[str], exclude_terms: List[str]) -> str:
@@ -92,6 +188,80 @@ Return ONLY a JSON object with keys "question", "options", "answer", "explanatio
 """.strip()
 
 
+def _plan_generation(
+        topic: str, context_chunks: Sequence[str], exclude_terms: List[str]
+) -> Optional[tuple]:
+    """Pick the study text for one question; returns (study_text, recent_stems, cache_key) or None."""
+    if isinstance(context_chunks, tuple):
+        usable_chunks = _usable_chunks(context_chunks, _exclusion_terms(exclude_terms))
+    else:
+        usable_chunks = _filter_chunks(context_chunks, exclude_terms)
+    if not usable_chunks:
+        logger.info("All context chunks were excluded by 'exclude_terms'. Aborting generation.")
+        return None
+
+    chunks = _sample_chunks(usable_chunks, max_chunks=3)
+    study_text = "\n\n---\n\n".join(chunks)
+    recent_stems = list(_RECENT_QUESTION_STEMS[topic])
+    return study_text, recent_stems, _generation_key(topic, chunks, exclude_terms)
+
+
+# Strict structured output: the server only returns objects matching QuizQuestion, so malformed
+# JSON or missing keys no longer cost a retry.
+_QUIZ_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "QuizQuestion",
+        "schema": {**QuizQuestion.model_json_schema(), "additionalProperties": False},
+        "strict": True,
+    },
+}
+
+
+def _response_format(model_id: str) -> dict:
+    # The chatgpt-* aliases don't accept json_schema; they keep plain JSON mode.
+    if model_id.startswith("chatgpt-"):
+        return {"type": "json_object"}
+    return _QUIZ_RESPONSE_FORMAT
+
+
+def _completion_params(model_id: str, prompt: str) -> dict:
+    return dict(
+        model=model_id,
+        messages=[_BASE_SYSTEM, {"role": "user", "content": prompt}],
+        temperature=0.9,
+        top_p=1.0,
+        presence_penalty=0.7,
+        frequency_penalty=0.2,
+        response_format=_response_format(model_id),
+    )
+
+
+def _parse_quiz(content: str, exclude_terms: List[str]) -> Optional[QuizQuestion]:
+    """Validate a model reply; None if it touches an excluded subtopic (raises on malformed output)."""
+    quiz = QuizQuestion.model_validate_json(content)
+
+    haystack = " ".join([quiz.question] + quiz.options + [quiz.explanation])
+    if _violates_exclusions(haystack, exclude_terms):
+        logger.debug("Quiz mentions an excluded subtopic; retrying…")
+        return None
+
+    if quiz.answer not in quiz.options:
+        raise ValueError("Answer is not among the provided options.")
+
+    opts = quiz.options[:]
+    random.shuffle(opts)
+    quiz.options = opts
+    return quiz
+
+
+def _accept_quiz(topic: str, cache_key: tuple, quiz: QuizQuestion) -> Dict[str, str]:
+    _RECENT_QUESTION_STEMS[topic].append(quiz.question.strip())
+    result = quiz.model_dump()
+    _remember_generation(cache_key, result)
+    return result
+
+
 def get_quiz_from_topic(
         topic: str,
         api_key: str,
@@ -102,47 +272,83 @@ def get_quiz_from_topic(
     context_chunks = context_chunks or []
     exclude_terms = [t.strip().lower() for t in (exclude_terms or [])]
 
-    usable_chunks = _filter_chunks(context_chunks, exclude_terms)
-    if not usable_chunks:
-        logger.info("All context chunks were excluded by 'exclude_terms'. Aborting generation.")
+    plan = _plan_generation(topic, context_chunks, exclude_terms)
+    if plan is None:
         return None
+    study_text, recent_stems, cache_key = plan
 
-    study_text = _sample_context(usable_chunks, max_chunks=3)
-    client = OpenAI(api_key=api_key)
-    recent_stems = list(_RECENT_QUESTION_STEMS[topic])
+    cached = _reuse_generation(cache_key, topic, recent_stems)
+    if cached is not None:
+        return cached
+
+    client = _client(api_key)
     model_id = getenv("MODEL_ID", "chatgpt-4o-latest")
 
+    prompt = _make_prompt(topic, study_text, recent_stems, exclude_terms)
     for attempt in range(max_retries):
-        prompt = _make_prompt(topic, study_text, recent_stems, exclude_terms)
         try:
-            response = client.chat.completions.create(
-                model=model_id,
-                messages=[_BASE_SYSTEM, {"role": "user", "content": prompt}],
-                temperature=0.9,
-                top_p=1.0,
-                presence_penalty=0.7,
-                frequency_penalty=0.2,
-                response_format={"type": "json_object"},
-            )
-            content = response.choices[0].message.content
-            quiz = QuizQuestion.parse_raw(content)
-
-            haystack = " ".join([quiz.question] + quiz.options + [quiz.explanation])
-            if _violates_exclusions(haystack, exclude_terms):
-                logger.debug("Quiz mentions an excluded subtopic; retrying…")
+            response = client.chat.completions.create(**_completion_params(model_id, prompt))
+            quiz = _parse_quiz(response.choices[0].message.content, exclude_terms)
+            if quiz is None:
                 continue
-
-            if quiz.answer not in quiz.options:
-                raise ValueError("Answer is not among the provided options.")
-
-            opts = quiz.options[:]
-            random.shuffle(opts)
-            quiz.options = opts
-
-            _RECENT_QUESTION_STEMS[topic].append(quiz.question.strip())
-            return quiz.dict()
+            return _accept_quiz(topic, cache_key, quiz)
 
         except Exception as e:
             logger.debug(f"Attempt {attempt + 1} failed: {e}")
 
     return None
+
+
+async def get_quiz_batch(
+        topics: List[str],
+        api_key: str,
+        topic_contexts: Optional[Dict[str, List[str]]] = None,
+        exclude_terms: Optional[List[str]] = None,
+        max_retries: int = 2,
+        max_concurrency: int = 8,
+        on_result: Optional[Callable[[Optional[Dict[str, str]]], None]] = None,
+) -> List[Optional[Dict[str, str]]]:
+    """
+    Generate one question per entry of `topics` concurrently (at most `max_concurrency` requests
+    in flight). Results are in input order; failed generations are None.
+    `on_result`, if given, is also called with each result as soon as it is ready.
+    """
+    topic_contexts = topic_contexts or {}
+    exclude_terms = [t.strip().lower() for t in (exclude_terms or [])]
+    model_id = getenv("MODEL_ID", "chatgpt-4o-latest")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _one(client: AsyncOpenAI, topic: str) -> Optional[Dict[str, str]]:
+        quiz = await _generate(client, topic)
+        if on_result is not None:
+            on_result(quiz)
+        return quiz
+
+    async def _generate(client: AsyncOpenAI, topic: str) -> Optional[Dict[str, str]]:
+        plan = _plan_generation(topic, topic_contexts.get(topic, []), exclude_terms)
+        if plan is None:
+            return None
+        study_text, recent_stems, cache_key = plan
+
+        cached = _reuse_generation(cache_key, topic, recent_stems)
+        if cached is not None:
+            return cached
+
+        prompt = _make_prompt(topic, study_text, recent_stems, exclude_terms)
+        for attempt in range(max_retries):
+            try:
+                async with semaphore:
+                    response = await client.chat.completions.create(**_completion_params(model_id, prompt))
+                quiz = _parse_quiz(response.choices[0].message.content, exclude_terms)
+                if quiz is None:
+                    continue
+                return _accept_quiz(topic, cache_key, quiz)
+
+            except Exception as e:
+                logger.debug(f"Attempt {attempt + 1} failed: {e}")
+
+        return None
+
+    # One async client per batch: its connection pool belongs to the running event loop
+    async with AsyncOpenAI(api_key=api_key) as client:
+        return list(await asyncio.gather(*[_one(client, topic) for topic in topics]))
@@ -1,23 +1,34 @@
+import asyncio
+import atexit
+import io
 import json
 import os
+import queue
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
 
 import streamlit as st
 from dotenv import load_dotenv
 
 from chat_with_PDF import render_pdf_chat
 from create_context_from_PDF import load_topic_contexts
-from export_db_to_Moodle import export_db_to_Moodle, build_moodle_xml_from_firestore
-from export_quiz_to_PDF import generate_quiz_pdf
 # Use live Firebase backend
 from firebase_backend import (
-    initialize_firebase, save_quiz_question, get_random_quiz_questions,
-    get_quiz_question_count, is_duplicate_question
+    initialize_firebase, save_quiz_questions_bulk, get_random_quiz_questions,
+    get_quiz_question_count, is_duplicate_question, question_hash
 )
-from get_quiz import get_quiz_from_topic
 
 
 # --- Export helpers ---
+def _remove_quietly(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
 def _resolve_firebase_credentials_path() -> str:
     """
     On Streamlit Cloud, prefer credentials from st.secrets["firebase_credentials"].
@@ -29,33 +40,244 @@ def _resolve_firebase_credentials_path() -> str:
         creds = None
 
     if creds:
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
-        tmp.write(json.dumps(dict(creds)).encode("utf-8"))
-        tmp.flush()
-        return tmp.name
+        # mkstemp creates the file owner-only (0600); it is removed again when the process exits
+        fd, path = tempfile.mkstemp(suffix=".json")
+        try:
+            os.write(fd, json.dumps(dict(creds)).encode("utf-8"))
+        finally:
+            os.close(fd)
+        atexit.register(_remove_quietly, path)
+        return path
 
     return "firebase_credentials.json"
 
 
+@st.cache_resource(show_spinner=False)
+def _init_firebase() -> str:
+    """Initialize the Firebase app once per process; returns the credentials path it used."""
+    cred_path = _resolve_firebase_credentials_path()
+    initialize_firebase(cred_path)
+    return cred_path
+
+
 # --- Initialize Firebase ---
-initialize_firebase(_resolve_firebase_credentials_path())
+_init_firebase()
 
 # --- Constants ---
 MAX_QUESTIONS = 10
+# OpenAI calls in flight while pre-generating a quiz (10 questions → two waves of 5)
+GENERATION_CONCURRENCY = 5
+# Longest a Next click waits for the next prefetched question before generating one itself (seconds)
+PREFETCH_WAIT_TIMEOUT = 15
+# Saved questions are written to Firestore in batches of this size (one commit each)
+SAVE_BATCH_SIZE = 5
+# Longest the summary page waits for this session's pending DB writes (seconds)
+WRITE_WAIT_TIMEOUT = 10
 
 EXCLUDED_TERMS = [
     "turtle graphics", "turtle", "turtle module",
     "turtle.forward", "turtle.backward", "turtle.left", "turtle.right"
 ]
 
+# Static screens
+WELCOME_HTML = """
+<div style='
+    background-color: #eaf4fc;
+    color: #31708f;
+    border: 1px solid #bce8f1;
+    padding: 10px;
+    border-radius: 5px;
+    text-align: center;
+'>
+    <div style='font-size: 20px; font-weight: bold;'>🏆 Welcome to the Python Quiz!</div>
+    <div style='font-size: 16px;'>🤔 Please start a new quiz or load existing questions from the sidebar.</div>
+</div>
+"""
+APP_CLOSED_HEADING = "## ✅ App Closed"
+APP_CLOSED_TEXT = "This app is now closed. You can safely close this browser tab or reopen the app to continue."
+
 # --- Load Environment ---
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 
 
 # --- FUNCTION DEFINITIONS ---
+@st.cache_resource(show_spinner=False)
+def _topic_contexts(topic_names: tuple) -> dict:
+    """
+    Chunked chapter text per topic, built once per process and shared read-only across reruns.
+    Each topic's chunks are frozen into a tuple so get_quiz can filter them once and reuse it.
+    """
+    return {t: tuple(chunks) for t, chunks in load_topic_contexts(list(topic_names)).items()}
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_question_count() -> int:
+    """DB question count for the sidebar; refreshed every 30 s or right after this session saves."""
+    return get_quiz_question_count()
+
+
+@st.cache_resource(show_spinner=False)
+def _background_executor() -> ThreadPoolExecutor:
+    """Workers for question prefetch, so generation doesn't block the script thread."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="quiz-background")
+
+
+@st.cache_resource(show_spinner=False)
+def _write_executor() -> ThreadPoolExecutor:
+    """Separate workers for DB writes, so a summary never queues behind other users' prefetches."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="quiz-db-write")
+
+
+def _save_question(topic, q):
+    # Questions this session already checked or saved skip the Firestore duplicate query.
+    # Same fingerprint as the DB's dedupe_hash, so both layers agree on what a duplicate is.
+    key = question_hash(q)
+    if key in st.session_state.known_question_hashes:
+        return
+    st.session_state.known_question_hashes.add(key)
+    # Buffer a snapshot of the dict: next_question later adds the user's answer to `q`,
+    # which must not end up in the DB.
+    st.session_state.pending_saves.append((topic, dict(q)))
+    if len(st.session_state.pending_saves) >= SAVE_BATCH_SIZE:
+        _flush_saves()
+
+
+def _flush_saves():
+    """Hand the buffered questions to a background worker as one batched write."""
+    if not st.session_state.pending_saves:
+        return
+    future = _write_executor().submit(_persist_questions, st.session_state.pending_saves)
+    st.session_state.pending_saves = []
+    pending = [f for f in st.session_state.pending_writes if not f.done()]
+    pending.append(future)
+    st.session_state.pending_writes = pending
+
+
+def _persist_questions(items):
+    # Runs on a worker thread: Firestore calls only, no st.* UI calls
+    by_topic = {}
+    for topic, q in items:
+        if not is_duplicate_question(q):
+            by_topic.setdefault(topic, []).append(q)
+    for topic, questions in by_topic.items():
+        save_quiz_questions_bulk(topic, questions)
+    if by_topic:
+        _cached_question_count.clear()
+
+
+def _wait_for_pending_writes():
+    """Flush buffered saves, then wait (bounded) for this session's background writes."""
+    _flush_saves()
+    # Unfinished writes stay pending and are waited on again at the next rerun
+    _, not_done = wait(st.session_state.pending_writes, timeout=WRITE_WAIT_TIMEOUT)
+    st.session_state.pending_writes = list(not_done)
+
+
+# get_quiz, export_quiz_to_PDF and export_db_to_Moodle are imported where they are used.
+# Only the PDF exporter (fpdf2/fontTools, ~170 ms) is a real saving on the first page load:
+# openai and firebase_admin are already loaded by chat_with_PDF and firebase_backend.
+def _generate_question(topic, topic_contexts):
+    from get_quiz import get_quiz_from_topic
+    return get_quiz_from_topic(
+        topic,
+        api_key,
+        topic_contexts.get(topic, []),
+        exclude_terms=EXCLUDED_TERMS
+    )
+
+
+def _generate_batch(topic, topic_contexts, n, ready):
+    """
+    n questions generated concurrently, at most GENERATION_CONCURRENCY OpenAI calls at a time.
+    Each result (None on failure) is put on the `ready` queue as soon as it completes.
+    """
+    from get_quiz import get_quiz_batch
+    asyncio.run(get_quiz_batch(
+        [topic] * n,
+        api_key,
+        topic_contexts,
+        exclude_terms=EXCLUDED_TERMS,
+        max_concurrency=GENERATION_CONCURRENCY,
+        on_result=ready.put
+    ))
+
+
+def _start_prefetch(topic, topic_contexts, n):
+    # The worker only builds question dicts and queues them; it never calls st.* off the script thread
+    ready = queue.SimpleQueue()
+    future = _background_executor().submit(_generate_batch, topic, topic_contexts, n, ready)
+    st.session_state.prefetch = (topic, future, ready)
+
+
+def _maybe_prefetch(topic, topic_contexts):
+    """Refill the question buffer in the background once the user reaches its last question."""
+    i = st.session_state.current_question
+    missing = st.session_state.get("max_questions_override", MAX_QUESTIONS) - len(st.session_state.questions)
+    if st.session_state.get("prefetch") or len(st.session_state.questions) != i + 1 or missing <= 0:
+        return
+    _start_prefetch(topic, topic_contexts, missing)
+
+
+def _take_prefetched(topic):
+    """
+    Prefetched questions for `topic` that are ready now. If none are, waits up to
+    PREFETCH_WAIT_TIMEOUT for the next one; empty if there is no prefetch (or it failed).
+    """
+    pending = st.session_state.get("prefetch")
+    if not pending or pending[0] != topic:
+        st.session_state.prefetch = None
+        return []
+    _, future, ready = pending
+
+    taken = []
+    while True:  # everything that is already done
+        try:
+            q = ready.get_nowait()
+        except queue.Empty:
+            break
+        if q:
+            taken.append(q)
+
+    # Nothing ready yet: wait (bounded) for the next question still in flight
+    deadline = time.monotonic() + PREFETCH_WAIT_TIMEOUT
+    while not taken and not (future.done() and ready.empty()):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            q = ready.get(timeout=min(remaining, 0.5))
+        except queue.Empty:
+            continue
+        if q:
+            taken.append(q)
+
+    # Keep the prefetch while the batch is still producing, so later Next clicks draw from it
+    if future.done() and ready.empty():
+        st.session_state.prefetch = None
+    return taken
+
+
+def _append_questions(topic, save_to_db, new_questions):
+    """Append generated questions, skipping stems already in this quiz; returns how many were added."""
+    seen = {q["question"].strip().lower() for q in st.session_state.questions}
+    added = 0
+    for q in new_questions:
+        stem = q["question"].strip().lower()
+        if stem in seen:
+            continue
+        seen.add(stem)
+        st.session_state.questions.append(q)
+        added += 1
+        if save_to_db:
+            _save_question(topic, q)
+    return added
+
+
 def start_quiz(topic, save_to_db, topic_contexts, load_random=False):
     """Resets the quiz state and loads the first question(s)."""
+    # Don't leave the previous quiz's buffered saves behind
+    _flush_saves()
     # Reset all relevant session state variables
     st.session_state.questions = []
     st.session_state.answers = {}
@@ -66,45 +288,60 @@ def start_quiz(topic, save_to_db, topic_contexts, load_random=False):
     st.session_state.quiz_data = []
     # Clear any previous PDF bytes
     st.session_state.pdf_bytes = None
+    # Drop a prefetch left over from the previous quiz
+    st.session_state.prefetch = None
 
     if load_random:
         # Pull questions from Firestore (firebase_backend)
         st.session_state.questions = get_random_quiz_questions(10)
         st.session_state.max_questions_override = len(st.session_state.questions)
     else:
-        q = get_quiz_from_topic(
-            topic,
-            api_key,
-            topic_contexts.get(topic, []),
-            exclude_terms=EXCLUDED_TERMS
-        )
+        # A previous random-load quiz may have lowered the cap
+        st.session_state.max_questions_override = MAX_QUESTIONS
+        q = _generate_question(topic, topic_contexts)
         if q:
-            st.session_state.questions.append(q)
-            if save_to_db and not is_duplicate_question(q):
-                save_quiz_question(topic, q)
+            _append_questions(topic, save_to_db, [q])
+            # Generate the rest of the quiz concurrently while the first question is answered
+            _start_prefetch(topic, topic_contexts, MAX_QUESTIONS - 1)
         else:
             st.error("Failed to load a quiz question. Please try again.")
 
-    # Always reset the timer state after starting a new quiz
-    st.session_state.last_rendered_question = -1
+
+@lru_cache(maxsize=256)
+def _render_kind(text, code_hints=()):
+    """How to show a question/explanation; cached because the same text is re-rendered on every rerun."""
+    if "```" in text:
+        return "md_html"
+    if "\n" in text or "    " in text or any(h in text for h in code_hints):
+        return "code"
+    return "md"
+
+
+def _render_text(text, kind, plain=st.markdown):
+    if kind == "md_html":
+        st.markdown(text, unsafe_allow_html=True)
+    elif kind == "code":
+        st.code(text, language="python")
+    else:
+        plain(text)
+
+
+def _submit_answer(i, options_to_display, correct):
+    if i in st.session_state.answers:
+        return  # already scored; a repeated callback must not count it twice
+    choice = options_to_display.index(st.session_state[i])
+    st.session_state.answers[i] = choice
+    # Keep the score current here instead of re-scanning every answer on each rerun
+    if options_to_display[choice] == correct:
+        st.session_state.right_answers += 1
+    else:
+        st.session_state.wrong_answers += 1
 
 
 def display_question(topic, save_to_db, topic_contexts):
     """Displays the current question and options."""
     if not st.session_state.questions:
-        st.markdown(\"\"\"
-        <div style='
-            background-color: #eaf4fc;
-            color: #31708f;
-            border: 1px solid #bce8f1;
-            padding: 10px;
-            border-radius: 5px;
-            text-align: center;
-        '>
-            <div style='font-size: 20px; font-weight: bold;'>🏆 Welcome to the Python Quiz!</div>
-            <div style='font-size: 16px;'>🤔 Please start a new quiz or load existing questions from the sidebar.</div>
-        </div>
-        \"\"\", unsafe_allow_html=True)
+        st.markdown(WELCOME_HTML, unsafe_allow_html=True)
         return
 
     i = st.session_state.current_question
@@ -114,13 +351,10 @@ def display_question(topic, save_to_db, topic_contexts):
         st.error("There was a problem loading this question.")
         return
 
+    _maybe_prefetch(topic, topic_contexts)
+
     st.markdown(f"**QUESTION {i + 1}.**")
-    if "```" in q["question"]:
-        st.markdown(q["question"], unsafe_allow_html=True)
-    elif "\\n" in q["question"] or "    " in q["question"]:
-        st.code(q["question"], language="python")
-    else:
-        st.markdown(q["question"])
+    _render_text(q["question"], _render_kind(q["question"]))
 
     already_answered = i in st.session_state.answers
     options_to_display = q["options"]
@@ -129,24 +363,23 @@ def display_question(topic, save_to_db, topic_contexts):
         correct_index = options_to_display.index(q["answer"])
         user_selection_index = st.session_state.answers[i]
 
-        def get_label(option_text, option_index):
-            if option_index == user_selection_index and user_selection_index == correct_index:
-                return f"✅ {option_text}"
-            elif option_index == user_selection_index and user_selection_index != correct_index:
-                return f"❌ {option_text}"
-            elif option_index == correct_index:
-                return f"✅ {option_text}"
-            return option_text
+        # Built once per render, so format_func is a dict lookup rather than an index() scan per option
+        labels = {opt: opt for opt in options_to_display}
+        if user_selection_index != correct_index:
+            wrong = options_to_display[user_selection_index]
+            labels[wrong] = f"❌ {wrong}"
+        correct = options_to_display[correct_index]
+        labels[correct] = f"✅ {correct}"
 
         st.radio("Your answer:", options_to_display,
                  index=user_selection_index,
-                 format_func=lambda x: get_label(x, options_to_display.index(x)),
+                 format_func=labels.get,
                  key=f"answered_{i}", disabled=True)
     else:
-        user_answer = st.radio("Your answer:", options_to_display, key=i)
-        if st.button("Submit"):
-            st.session_state.answers[i] = options_to_display.index(user_answer)
-            st.rerun()
+        st.radio("Your answer:", options_to_display, key=i)
+        # Recorded in the click callback, so the rerun that follows (just the question
+        # panel) already renders the answered state; no second st.rerun() needed.
+        st.button("Submit", on_click=_submit_answer, args=(i, options_to_display, q["answer"]))
 
     if already_answered:
         is_correct = options_to_display[st.session_state.answers[i]] == q["answer"]
@@ -156,12 +389,7 @@ def display_question(topic, save_to_db, topic_contexts):
             st.error(f"❌ Sorry, the correct answer was: **{q['answer']}**")
 
         with st.expander("Explanation"):
-            if "```" in q["explanation"]:
-                st.markdown(q["explanation"], unsafe_allow_html=True)
-            elif "\\n" in q["explanation"] or "    " in q["explanation"] or "print(" in q["explanation"]:
-                st.code(q["explanation"], language="python")
-            else:
-                st.write(q["explanation"])
+            _render_text(q["explanation"], _render_kind(q["explanation"], code_hints=("print(",)), st.write)
 
 
 def next_question(topic, save_to_db, topic_contexts):
@@ -184,58 +412,45 @@ def next_question(topic, save_to_db, topic_contexts):
         return
 
     st.session_state.current_question += 1
-    st.session_state.last_rendered_question = -1
 
     if st.session_state.current_question >= len(st.session_state.questions):
-        q_next = get_quiz_from_topic(
-            topic,
-            api_key,
-            topic_contexts.get(topic, []),
-            exclude_terms=EXCLUDED_TERMS
+        if not _append_questions(topic, save_to_db, _take_prefetched(topic)):
+            q_next = _generate_question(topic, topic_contexts)
+            if not (q_next and _append_questions(topic, save_to_db, [q_next])):
+                st.error("Failed to load the next quiz question.")
+                st.session_state.current_question -= 1
+
+
+def _quiz_pdf():
+    """Renders the summary PDF once per finished quiz; start_quiz resets it for the next one."""
+    if st.session_state.get("pdf_bytes") is None:
+        from export_quiz_to_PDF import generate_quiz_pdf
+        st.session_state.pdf_bytes = generate_quiz_pdf(
+            st.session_state.quiz_data,
+            quiz_title="Python quiz and solutions"
         )
-        if q_next:
-            st.session_state.questions.append(q_next)
-            if save_to_db and not is_duplicate_question(q_next):
-                save_quiz_question(topic, q_next)
-        else:
-            st.error("Failed to load the next quiz question.")
-            st.session_state.current_question -= 1
-
-
-def update_score():
-    """Recalculates the score based on answers."""
-    st.session_state.right_answers = 0
-    st.session_state.wrong_answers = 0
-    for i, q in enumerate(st.session_state.questions):
-        if i in st.session_state.answers and st.session_state.answers[i] != -1:
-            if q['options'][st.session_state.answers[i]] == q['answer']:
-                st.session_state.right_answers += 1
-            else:
-                st.session_state.wrong_answers += 1
-        elif i in st.session_state.answers and st.session_state.answers[i] == -1:  # Skipped
-            st.session_state.wrong_answers += 1
+    return st.session_state.pdf_bytes
 
 
 def show_summary(topic, save_to_db, topic_contexts):
     """Displays the final quiz summary and options."""
+    # Make sure this quiz's questions are persisted before the user may leave
+    _wait_for_pending_writes()
     st.markdown("## 🎉 Quiz Complete!")
     st.success("You’ve reached the end of the quiz.")
     total = st.session_state.right_answers + st.session_state.wrong_answers
     score = (st.session_state.right_answers / total) * 100 if total > 0 else 0
-    st.markdown(f\"\"\"
+    st.markdown(f"""
     **📊 Your Stats:**
     - ✅ Correct Answers: {st.session_state.right_answers}
     - ❌ Incorrect Answers: {st.session_state.wrong_answers}
     - 🧠 Total Questions Answered: {total}
     - 🏁 Final Score: **{score:.1f}%**
-    \"\"\")
+    """)
 
     st.download_button(
         "⬇️ Download your quiz PDF",
-        data=generate_quiz_pdf(
-            st.session_state.quiz_data,
-            quiz_title="Python quiz and solutions"
-        ),
+        data=_quiz_pdf(),
         file_name="quiz.pdf",
         mime="application/pdf",
         use_container_width=True,
@@ -247,7 +462,8 @@ def init_state():
     defaults = {
         "questions": [], "answers": {}, "current_question": 0, "right_answers": 0,
         "wrong_answers": 0, "quiz_complete": False, "max_questions_override": MAX_QUESTIONS,
-        "quiz_data": [], "app_closed": False
+        "quiz_data": [], "app_closed": False, "known_question_hashes": set(),
+        "pending_writes": [], "pending_saves": []
     }
     for key, default in defaults.items():
         if key not in st.session_state:
@@ -279,8 +495,8 @@ st.markdown("---")
 
 # --- Closed screen check ---
 if st.session_state.get("app_closed", False):
-    st.markdown("## ✅ App Closed")
-    st.info("This app is now closed. You can safely close this browser tab or reopen the app to continue.")
+    st.markdown(APP_CLOSED_HEADING)
+    st.info(APP_CLOSED_TEXT)
     if st.button("🔓 Reopen app"):
         st.session_state.app_closed = False
         st.rerun()
@@ -293,7 +509,7 @@ topics = [
     "Chapter05 Functions", "Chapter06 Files and Exceptions", "Chapter07 Lists and Tuples",
     "Chapter08 More About Strings", "Chapter09 Dictionaries and Sets"
 ]
-topic_contexts = load_topic_contexts(topics)
+topic_contexts = _topic_contexts(tuple(topics))
 
 # Sidebar (upper part)
 with st.sidebar.expander("Please select a topic", expanded=True):
@@ -305,78 +521,104 @@ st.session_state.selected_topic = topic
 # Mount PDF chat using the same topic
 render_pdf_chat(selected_topic=topic)
 
-# Save toggle + DB info (upper part)
+# Save toggle (upper part); it feeds the main panel, so it stays outside the fragments
 save_to_db = st.sidebar.checkbox("📂 Save questions to DB", value=False)
-st.sidebar.info(f"📦 Total number of quiz questions in DB: {get_quiz_question_count()}")
 
 # Compute quiz state
 quiz_in_progress = bool(st.session_state.questions and not st.session_state.quiz_complete)
 st.session_state.quiz_in_progress = quiz_in_progress
 
-# --- Separator between upper part and functions ---
-st.sidebar.markdown("---")
 
-# --- One section for all actions ---
-st.sidebar.subheader("🧰 Functions")
+# Fragments: a click inside one reruns just that function instead of the whole script.
+# Actions that change the quiz itself still call st.rerun(), which reruns the full app.
+@st.fragment
+def sidebar_panel(topic, save_to_db, topic_contexts, quiz_in_progress):
+    st.info(f"📦 Total number of quiz questions in DB: {_cached_question_count()}")
 
-# Start quiz
-if st.sidebar.button("🚀 Start Quiz", disabled=quiz_in_progress):
-    start_quiz(topic, save_to_db, load_topic_contexts(topics))
-    st.rerun()
+    # --- Separator between upper part and functions ---
+    st.markdown("---")
 
-# Load random questions (from Firebase)
-if st.sidebar.button("🎲 Load 10 Random Questions (from Firebase)", disabled=quiz_in_progress):
-    start_quiz(topic, save_to_db, load_topic_contexts(topics), load_random=True)
-    st.rerun()
+    # --- One section for all actions ---
+    st.subheader("🧰 Functions")
 
-# Export Moodle XML — download-only, no file written to disk
-if st.sidebar.button("💾 Prepare Moodle XML for Download"):
-    cred_path = _resolve_firebase_credentials_path()
-    try:
-        xml = build_moodle_xml_from_firestore(
-            credential_path=cred_path,
-            collection="quiz_questions",
-            category="Python Quiz",
-            shuffleanswers=True
+    # Start quiz
+    if st.button("🚀 Start Quiz", disabled=quiz_in_progress):
+        start_quiz(topic, save_to_db, topic_contexts)
+        st.rerun()
+
+    # Load random questions (from Firebase)
+    if st.button("🎲 Load 10 Random Questions (from Firebase)", disabled=quiz_in_progress):
+        start_quiz(topic, save_to_db, topic_contexts, load_random=True)
+        st.rerun()
+
+    # Export Moodle XML — download-only, no file written to disk
+    if st.button("💾 Prepare Moodle XML for Download"):
+        from export_db_to_Moodle import export_db_to_Moodle
+        cred_path = _init_firebase()
+        try:
+            # Encoded straight into one in-memory buffer; no intermediate str or bytes copy
+            xml_buf = io.BytesIO()
+            written = export_db_to_Moodle(
+                credential_path=cred_path,
+                output_path=xml_buf,
+                collection="quiz_questions",
+                category="Python Quiz",
+                shuffleanswers=True,
+                # st.sidebar can't be called from a fragment; this one already renders there
+                on_skip=st.warning
+            )
+            st.session_state.moodle_xml = xml_buf
+            st.session_state.moodle_xml_filename = "moodle_questions.xml"
+            st.success(f"Moodle XML with {written} questions is ready. Use the download button below.")
+        except Exception as e:
+            st.error(f"Export failed: {e}")
+
+    if "moodle_xml" in st.session_state:
+        st.download_button(
+            "⬇️ Download Moodle XML",
+            data=st.session_state.moodle_xml,
+            file_name=st.session_state.get("moodle_xml_filename", "moodle_questions.xml"),
+            mime="application/xml",
+            use_container_width=True,
         )
-        st.session_state.moodle_xml_bytes = xml.encode("utf-8")
-        st.session_state.moodle_xml_filename = "moodle_questions.xml"
-        st.sidebar.success("Moodle XML is ready. Use the download button below.")
-    except Exception as e:
-        st.sidebar.error(f"Export failed: {e}")
-
-if "moodle_xml_bytes" in st.session_state:
-    st.sidebar.download_button(
-        "⬇️ Download Moodle XML",
-        data=st.session_state.moodle_xml_bytes,
-        file_name=st.session_state.get("moodle_xml_filename", "moodle_questions.xml"),
-        mime="application/xml",
-        use_container_width=True,
-    )
 
-# Close app (disabled while a quiz is in progress)
-close_disabled = quiz_in_progress or st.session_state.app_closed
-if st.sidebar.button("❌ Close App", disabled=close_disabled):
-    st.session_state.app_closed = True
-    st.rerun()
+    # Close app (disabled while a quiz is in progress)
+    close_disabled = quiz_in_progress or st.session_state.app_closed
+    if st.button("❌ Close App", disabled=close_disabled):
+        _flush_saves()
+        st.session_state.app_closed = True
+        st.rerun()
+
+
+@st.fragment
+def question_panel(topic, save_to_db, topic_contexts):
+    display_question(topic, save_to_db, topic_contexts)
+    if st.session_state.questions:
+        st.write(f"Right answers: {st.session_state.right_answers}")
+        st.write(f"Wrong answers: {st.session_state.wrong_answers}")
+
+
+@st.fragment
+def summary_panel(topic, save_to_db, topic_contexts):
+    show_summary(topic, save_to_db, topic_contexts)
+
+
+# Fragments can't call st.sidebar themselves, so this one is mounted inside it
+with st.sidebar:
+    sidebar_panel(topic, save_to_db, topic_contexts, quiz_in_progress)
 
 # --- Main content ---
 col_main, col_next = st.columns([8, 1])
 
-if st.session_state.questions and not st.session_state.quiz_complete:
-    update_score()
-
+# Next changes current_question, which every panel reads, so it stays a full rerun
 with col_next:
     if st.session_state.questions and not st.session_state.quiz_complete:
         if st.button("Next"):
-            next_question(topic, save_to_db, load_topic_contexts(topics))
+            next_question(topic, save_to_db, topic_contexts)
             st.rerun()
 
 with col_main:
     if st.session_state.quiz_complete:
-        show_summary(topic, save_to_db, load_topic_contexts(topics))
+        summary_panel(topic, save_to_db, topic_contexts)
     else:
-        display_question(topic, save_to_db, load_topic_contexts(topics))
-        if st.session_state.questions:
-            st.write(f"Right answers: {st.session_state.right_answers}")
-            st.write(f"Wrong answers: {st.session_state.wrong_answers}")
+        question_panel(topic, save_to_db, topic_contexts)
@@ -0,0 +1,14 @@
+from create_context_from_PDF import chunk_text
+
+
+def test_chunks_overlap_and_cover_the_text():
+    text = "".join(chr(ord("a") + i % 26) for i in range(2500))
+    chunks = chunk_text(text, chunk_size=1000, overlap=200)
+    # A new chunk starts every chunk_size - overlap characters
+    assert chunks == [text[start:start + 1000] for start in (0, 800, 1600, 2400)]
+    assert chunks[1][:200] == chunks[0][800:]
+
+
+def test_chunk_text_strips_and_handles_empty_input():
+    assert chunk_text("  short  ", chunk_size=1000, overlap=200) == ["short"]
+    assert chunk_text("   ") == []
@@ -0,0 +1,65 @@
+import io
+import xml.etree.ElementTree as ET
+
+import export_db_to_Moodle
+from export_db_to_Moodle import _validate_question, _write_moodle_xml
+
+
+def _write(monkeypatch, questions, **kwargs):
+    monkeypatch.setattr(export_db_to_Moodle, "_iter_questions", lambda collection, limit: iter(questions))
+    skipped = []
+    out = io.StringIO()
+    written = _write_moodle_xml(
+        out, "quiz_questions", limit=None, category=kwargs.get("category"),
+        shuffleanswers=kwargs.get("shuffleanswers", True), on_skip=skipped.append
+    )
+    return written, skipped, out.getvalue()
+
+
+def test_validate_question():
+    assert _validate_question({"question": "Q", "options": ["a", "b"], "answer": "a"}) is None
+    assert "missing" in _validate_question({"question": "Q", "options": [], "answer": "a"})
+    assert _validate_question({"question": "Q", "options": ["a"], "answer": "b"}) == "answer is not among options"
+    assert "exactly one" in _validate_question({"question": "Q", "options": ["a", "a"], "answer": "a"})
+
+
+def test_writes_well_formed_escaped_xml(monkeypatch):
+    questions = [
+        {"question": "Is 1 < 2 & 3 > 2?", "options": ["yes", "no"], "answer": "yes",
+         "explanation": "Both \"hold\"", "topic": "Chapter03"},
+    ]
+    written, skipped, xml = _write(monkeypatch, questions, category="Python Quiz")
+    assert (written, skipped) == (1, [])
+
+    root = ET.fromstring(xml)
+    category, question = root.findall("question")
+    assert category.get("type") == "category"
+    assert category.find("category/text").text == "$course$/Python Quiz"
+    assert question.get("type") == "multichoice"
+    assert question.find("questiontext/text").text == "Is 1 < 2 & 3 > 2?"
+    assert question.find("name/text").text == "Q1: Chapter03"
+    fractions = {a.find("text").text: a.get("fraction") for a in question.findall("answer")}
+    assert fractions == {"yes": "100", "no": "0"}
+
+
+def test_invalid_questions_are_reported_and_skipped(monkeypatch):
+    questions = [
+        {"question": "ok", "options": ["a", "b"], "answer": "a"},
+        {"question": "bad", "options": ["a", "b"], "answer": "z"},
+    ]
+    written, skipped, xml = _write(monkeypatch, questions, shuffleanswers=False)
+    assert written == 1
+    assert skipped == ["Skipping invalid question 2: answer is not among options"]
+    root = ET.fromstring(xml)
+    assert [q.find("questiontext/text").text for q in root.findall("question")] == ["ok"]
+    assert root.find("question/shuffleanswers").text == "false"
+
+
+def test_export_into_a_binary_stream(monkeypatch):
+    monkeypatch.setattr(export_db_to_Moodle, "initialize_firebase", lambda path: None)
+    monkeypatch.setattr(export_db_to_Moodle, "_iter_questions",
+                        lambda collection, limit: iter([{"question": "ü?", "options": ["ä", "b"], "answer": "ä"}]))
+    buf = io.BytesIO()
+    assert export_db_to_Moodle.export_db_to_Moodle("creds.json", buf) == 1
+    assert not buf.closed
+    assert ET.fromstring(buf.getvalue()).find("question/questiontext/text").text == "ü?"
@@ -0,0 +1,136 @@
+import random
+
+import firebase_backend
+import firebase_snapshot
+from firebase_backend import are_questions_identical, question_hash
+
+
+def _q(question="What does len([1, 2]) return?", options=("1", "2", "3", "4"), answer="2"):
+    return {"question": question, "options": list(options), "answer": answer}
+
+
+def test_question_hash_ignores_option_order():
+    a = _q()
+    b = _q(options=("4", "3", "2", "1"))
+    assert are_questions_identical(a, b)
+    assert question_hash(a) == question_hash(b)
+
+
+def test_question_hash_ignores_non_identity_fields():
+    a = _q()
+    b = {**_q(), "explanation": "len counts items", "topic": "Lists", "user_answer": "2"}
+    assert question_hash(a) == question_hash(b)
+
+
+def test_question_hash_distinguishes_what_are_questions_identical_does():
+    base = _q()
+    variants = [
+        _q(question="What does len([1, 2, 3]) return?"),
+        _q(answer="3"),
+        _q(options=("1", "2", "3", "5")),
+    ]
+    for other in variants:
+        assert not are_questions_identical(base, other)
+        assert question_hash(base) != question_hash(other)
+
+
+def test_same_stem_with_different_options_is_not_a_duplicate():
+    a = _q(question="Which of the following statements is true?", options=("a", "b"), answer="a")
+    b = _q(question="Which of the following statements is true?", options=("c", "d"), answer="c")
+    assert question_hash(a) != question_hash(b)
+
+
+def test_snapshot_backend_uses_the_same_hash():
+    q = _q(options=("ü", "ß", "2", "x"))
+    assert firebase_snapshot.question_hash(q) == question_hash(q)
+
+
+# --- Minimal in-memory stand-in for the Firestore queries the backend issues ---
+
+class _Doc:
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Agg:
+    def __init__(self, n):
+        self.value = n
+
+
+class _Query:
+    _OPS = {">=": lambda a, b: a >= b, "<": lambda a, b: a < b, "==": lambda a, b: a == b}
+
+    def __init__(self, docs, limit=None):
+        self._docs, self._limit = docs, limit
+
+    def select(self, fields):
+        return self
+
+    def where(self, filter):
+        op = self._OPS[filter.op_string]
+        docs = [d for d in self._docs if filter.field_path in d and op(d[filter.field_path], filter.value)]
+        return _Query(docs, self._limit)
+
+    def order_by(self, field):
+        return _Query(sorted(self._docs, key=lambda d: d[field]), self._limit)
+
+    def limit(self, n):
+        return _Query(self._docs, n)
+
+    def stream(self):
+        docs = self._docs if self._limit is None else self._docs[:self._limit]
+        return iter([_Doc(d) for d in docs])
+
+    def count(self):
+        n = len(self._docs)
+
+        class _Result:
+            @staticmethod
+            def get():
+                return [[_Agg(n)]]
+
+        return _Result()
+
+
+class _DB:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def collection(self, name):
+        return _Query(self._docs)
+
+
+def _use_db(monkeypatch, docs):
+    monkeypatch.setattr(firebase_backend, "_DB", _DB(docs))
+    monkeypatch.setattr(firebase_backend, "_UNINDEXED_DOCS", None)
+
+
+def test_duplicate_check_uses_the_indexed_hash(monkeypatch):
+    saved = _q()
+    _use_db(monkeypatch, [{**saved, **firebase_backend._indexed_fields(saved)}])
+    assert firebase_backend.is_duplicate_question(_q(options=("4", "3", "2", "1")))
+    assert not firebase_backend.is_duplicate_question(_q(answer="3"))
+
+
+def test_duplicate_check_still_sees_legacy_docs(monkeypatch):
+    _use_db(monkeypatch, [_q()])  # saved before dedupe_hash/rand_key existed
+    assert firebase_backend.is_duplicate_question(_q(options=("4", "3", "2", "1")))
+    assert not firebase_backend.is_duplicate_question(_q(answer="3"))
+
+
+def test_random_questions_from_indexed_docs(monkeypatch):
+    docs = [_q(question=f"Q{i}") for i in range(20)]
+    _use_db(monkeypatch, [{**d, **firebase_backend._indexed_fields(d)} for d in docs])
+    picked = firebase_backend.get_random_quiz_questions(10)
+    assert len(picked) == 10
+    assert len({q["question"] for q in picked}) == 10
+
+
+def test_random_questions_fall_back_for_legacy_docs(monkeypatch):
+    _use_db(monkeypatch, [_q(question=f"Q{i}") for i in range(12)])
+    random.seed(0)
+    picked = firebase_backend.get_random_quiz_questions(10)
+    assert len(picked) == 10
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import firebase_snapshot
+
+QUESTIONS = [
+    {"question": f"Question {i} – what is ü?", "options": ["a", "b", "c", "d"], "answer": "a",
+     "explanation": "because", "topic": "Chapter08 More About Strings"}
+    for i in range(25)
+]
+
+
+def _write_json(path):
+    path.write_text(json.dumps(QUESTIONS, ensure_ascii=False), encoding="utf-8")
+
+
+def test_reads_json(tmp_path):
+    path = tmp_path / "questions_snapshot.json"
+    _write_json(path)
+    assert firebase_snapshot._read_snapshot(str(path)) == QUESTIONS
+
+
+def test_reads_json_without_orjson(tmp_path, monkeypatch):
+    monkeypatch.setattr(firebase_snapshot, "orjson", None)
+    path = tmp_path / "questions_snapshot.json"
+    _write_json(path)
+    assert firebase_snapshot._read_snapshot(str(path)) == QUESTIONS
+
+
+def test_reads_zstd_json(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "questions_snapshot.json.zst"
+    raw = json.dumps(QUESTIONS, ensure_ascii=False).encode("utf-8")
+    path.write_bytes(zstandard.ZstdCompressor(level=3).compress(raw))
+    assert firebase_snapshot._read_snapshot(str(path)) == QUESTIONS
+
+
+def test_reads_parquet(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "questions_snapshot.parquet"
+    pq.write_table(pa.Table.from_pylist(QUESTIONS), path)
+    assert firebase_snapshot._read_snapshot(str(path)) == QUESTIONS
+
+
+def test_reads_msgpack(tmp_path):
+    msgpack = pytest.importorskip("msgpack")
+    path = tmp_path / "questions_snapshot.msgpack"
+    path.write_bytes(msgpack.packb(QUESTIONS, use_bin_type=True))
+    assert firebase_snapshot._read_snapshot(str(path)) == QUESTIONS
+
+
+@pytest.fixture
+def snapshot_at(monkeypatch):
+    def use(path):
+        monkeypatch.setattr(firebase_snapshot, "_SNAPSHOT_PATH", str(path))
+        monkeypatch.setattr(firebase_snapshot, "_SNAPSHOT_DATA", [])
+        monkeypatch.setattr(firebase_snapshot, "_LOADED", False)
+        monkeypatch.setattr(firebase_snapshot, "_SNAPSHOT_COUNT", None)
+    return use
+
+
+def test_count_and_random_sample(tmp_path, snapshot_at):
+    path = tmp_path / "questions_snapshot.json"
+    _write_json(path)
+    snapshot_at(path)
+    assert firebase_snapshot.get_quiz_question_count() == len(QUESTIONS)
+    picked = firebase_snapshot.get_random_quiz_questions(10)
+    assert len(picked) == 10
+    assert len({q["question"] for q in picked}) == 10
+    assert all(q in QUESTIONS for q in picked)
+
+
+def test_missing_snapshot_is_empty(tmp_path, snapshot_at):
+    snapshot_at(tmp_path / "missing.json")
+    assert firebase_snapshot.get_random_quiz_questions(10) == []
+    assert firebase_snapshot.get_quiz_question_count() == 0
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+
+import get_quiz
+from get_quiz import _exclusion_matcher, _exclusion_terms, _filter_chunks, _generation_key
+
+
+def test_exclusion_terms_are_normalized_and_deduplicated():
+    assert _exclusion_terms(["Turtle", "turtle", "", "Lambda"]) == ("turtle", "lambda")
+    assert _exclusion_terms(None) == ()
+
+
+def test_exclusion_matcher_finds_any_term():
+    matches = _exclusion_matcher(("turtle", "lambda"))
+    assert matches("import turtle")
+    assert matches("a lambda expression")
+    assert not matches("a list comprehension")
+
+
+def test_exclusion_matcher_with_many_terms():
+    terms = tuple(f"term{i}" for i in range(get_quiz._AUTOMATON_MIN_TERMS + 2))
+    matches = _exclusion_matcher(terms)
+    assert matches("mentions term9 here")
+    assert not matches("mentions nothing")
+
+
+def test_filter_chunks_is_case_insensitive():
+    chunks = ["Using the Turtle module", "Lists and tuples", "turtle.forward(10)"]
+    assert _filter_chunks(chunks, ["turtle"]) == ["Lists and tuples"]
+    assert _filter_chunks(chunks, []) == chunks
+
+
+def test_tuple_contexts_are_filtered_once_per_term_set():
+    chunks = ("Using the Turtle module", "Lists and tuples", "Dictionaries")
+    get_quiz._usable_chunks.cache_clear()
+    for _ in range(3):
+        assert get_quiz._plan_generation("Topic", chunks, ["turtle"]) is not None
+    info = get_quiz._usable_chunks.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
+
+
+def test_generation_key_ignores_chunk_order():
+    assert _generation_key("T", ["a", "b", "c"], ["x"]) == _generation_key("T", ["c", "a", "b"], ["x"])
+    assert _generation_key("T", ["a", "b"], ["x"]) != _generation_key("T", ["a", "c"], ["x"])
+    assert _generation_key("T", ["a", "b"], ["x"]) != _generation_key("T", ["ab"], ["x"])
+
+
+def test_generation_cache_is_a_bounded_lru(monkeypatch):
+    monkeypatch.setattr(get_quiz, "_GENERATION_CACHE", OrderedDict())
+    monkeypatch.setattr(get_quiz, "_GENERATION_CACHE_SIZE", 2)
+    remember = get_quiz._remember_generation
+
+    remember(("a",), {"question": "qa"})
+    remember(("b",), {"question": "qb"})
+    remember(("a",), {"question": "qa2"})  # refreshes "a"
+    remember(("c",), {"question": "qc"})  # evicts "b", the least recently used
+
+    assert list(get_quiz._GENERATION_CACHE) == [("a",), ("c",)]
+    assert [q["question"] for q in get_quiz._GENERATION_CACHE[("a",)]] == ["qa", "qa2"]
+
+
+def test_generation_cache_keeps_the_latest_entries_per_key(monkeypatch):
+    monkeypatch.setattr(get_quiz, "_GENERATION_CACHE", OrderedDict())
+    for i in range(get_quiz._GENERATIONS_PER_KEY + 2):
+        get_quiz._remember_generation(("k",), {"question": f"q{i}"})
+    kept = [q["question"] for q in get_quiz._GENERATION_CACHE[("k",)]]
+    assert kept == [f"q{i}" for i in range(2, get_quiz._GENERATIONS_PER_KEY + 2)]
+
+
+def test_reuse_skips_recent_stems_and_reshuffles_a_copy(monkeypatch):
+    monkeypatch.setattr(get_quiz, "_GENERATION_CACHE", OrderedDict())
+    monkeypatch.setattr(get_quiz, "_CACHE_REUSE_PROBABILITY", 1.0)
+    stored = {"question": "Q?", "options": ["a", "b", "c", "d"], "answer": "a", "explanation": ""}
+    get_quiz._remember_generation(("k",), stored)
+
+    assert get_quiz._reuse_generation(("k",), "topic-x", ["Q?"]) is None
+    reused = get_quiz._reuse_generation(("k",), "topic-x", [])
+    assert reused is not None and reused is not stored
+    assert sorted(reused["options"]) == ["a", "b", "c", "d"]
+    assert get_quiz._GENERATION_CACHE[("k",)][0]["options"] == ["a", "b", "c", "d"]
@@ -1,5 +0,0 @@
-from gpt_quiz import __version__
-
-
-def test_version():
-    assert __version__ == '0.1.0'